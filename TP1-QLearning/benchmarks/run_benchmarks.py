@@ -0,0 +1,237 @@
+"""Benchmarks de rendimiento del entorno, el entrenamiento, la evaluación y el render.
+
+Se ejecuta desde la carpeta TP1-QLearning:
+
+    python benchmarks/run_benchmarks.py --output benchmarks/results.json
+    python benchmarks/run_benchmarks.py --compare benchmarks/baseline.json
+
+Cada benchmark reporta una métrica de throughput (más alto es mejor) o de latencia
+(más bajo es mejor). Con --compare se marca como regresión toda métrica que empeore
+más que --threshold respecto del baseline, y el script termina con código 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+base_dirpath = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # ./TP1-QLearning
+sys.path.insert(0, base_dirpath)
+
+from utilidades.taxi_env import TaxiEnvCustom, generate_city_blocks, remove_obstacles  # noqa: E402
+from utilidades.algoritmos_rl import q_learning  # noqa: E402
+from utilidades.evaluate import evaluate_q_table  # noqa: E402
+
+img_dirpath = os.path.join(base_dirpath, "img")  # ./TP1-QLearning/img
+
+GRID_SIZE = 10
+PICKUP_LOCATIONS = [(1, 1), (8, 7), (4, 2), (2, 8)]
+DROPOFF_LOCATIONS = [(5, 5), (5, 4), (4, 5), (4, 4)]
+OBSTACLES = remove_obstacles(
+    generate_city_blocks(GRID_SIZE), PICKUP_LOCATIONS + DROPOFF_LOCATIONS
+)
+
+SEED = 0
+
+
+def make_env(**kwargs):
+    return TaxiEnvCustom(
+        GRID_SIZE, PICKUP_LOCATIONS, DROPOFF_LOCATIONS, OBSTACLES, **kwargs
+    )
+
+
+def best_time(fn, repeats):
+    """Mejor tiempo (en segundos) de repeats ejecuciones de fn."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_step(n, repeats, compiled):
+    env = make_env(compiled=compiled, seed=SEED)
+    actions = np.random.default_rng(SEED).integers(0, env.action_space, size=n).tolist()
+
+    def run():
+        env.reset(seed=SEED)
+        for action in actions:
+            _, _, done, _ = env.step(action)
+            if done:
+                env.reset()
+
+    return n / best_time(run, repeats)
+
+
+def bench_reset(n, repeats):
+    env = make_env(seed=SEED)
+
+    def run():
+        for _ in range(n):
+            env.reset()
+
+    return n / best_time(run, repeats)
+
+
+def bench_encode_decode(n, repeats):
+    env = make_env()
+    states = np.random.default_rng(SEED).integers(0, env.state_space, size=n).tolist()
+
+    def run():
+        for state in states:
+            env.encode(*env.decode(state))
+
+    return n / best_time(run, repeats)
+
+
+def bench_q_learning(episodes, repeats):
+    env = make_env(compiled=True)
+    return episodes / best_time(
+        lambda: q_learning(0.3, 0.9, 0.2, env, episodes=episodes, seed=SEED), repeats
+    )
+
+
+def bench_evaluate(episodes, repeats):
+    env = make_env(compiled=True)
+    _, q_table = q_learning(0.3, 0.9, 0.2, env, episodes=1000, seed=SEED)
+    return 1000 * best_time(
+        lambda: evaluate_q_table(q_table, env, episodes=episodes, seed=SEED), repeats
+    )
+
+
+def bench_render(n, repeats):
+    env = make_env(img_base_path=img_dirpath, headless=True)
+    env.render()
+    with tempfile.TemporaryDirectory() as tmp_dirpath:
+        img_path = os.path.join(tmp_dirpath, "frame.png")
+
+        def run():
+            for i in range(n):
+                env.step(i % env.action_space)
+                env.render()
+                env.save_render(img_path)
+
+        return n / best_time(run, repeats)
+
+
+def bench_video(n, repeats):
+    from utilidades.graficar import generar_video
+
+    env = make_env(img_base_path=img_dirpath, headless=True)
+    frames = []
+    for i in range(n):
+        env.step(i % env.action_space)
+        frames.append(env.render())
+
+    with tempfile.TemporaryDirectory() as tmp_dirpath:
+        video_path = os.path.join(tmp_dirpath, "video.gif")
+        return 1000 * best_time(
+            lambda: generar_video(None, video_path, fps=5, frames=iter(frames)), repeats
+        )
+
+
+# nombre: (función que recibe el factor de reducción de trabajo, unidad, más alto es mejor)
+BENCHMARKS = {
+    "env_step": (lambda q: bench_step(20_000 // q, 3, False), "steps/s", True),
+    "env_step_compiled": (lambda q: bench_step(20_000 // q, 3, True), "steps/s", True),
+    "env_reset": (lambda q: bench_reset(20_000 // q, 3), "resets/s", True),
+    "encode_decode": (lambda q: bench_encode_decode(20_000 // q, 3), "estados/s", True),
+    "q_learning": (lambda q: bench_q_learning(1000 // q, 3), "episodios/s", True),
+    "evaluate_q_table": (lambda q: bench_evaluate(100 // q, 3), "ms", False),
+    "render_save": (lambda q: bench_render(200 // q, 3), "frames/s", True),
+    "generar_video": (lambda q: bench_video(50 // q, 3), "ms", False),
+}
+
+
+def run_benchmarks(names, quick):
+    scale = 10 if quick else 1
+    results = {}
+    for name in names:
+        fn, unit, higher_is_better = BENCHMARKS[name]
+        value = fn(scale)
+        results[name] = {
+            "value": value,
+            "unit": unit,
+            "higher_is_better": higher_is_better,
+        }
+        print(f"{name:<20} {value:>14.2f} {unit}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Compara contra el baseline y devuelve la lista de regresiones."""
+    regressions = []
+    print(f"\n{'benchmark':<20} {'baseline':>14} {'actual':>14} {'cambio':>9}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]["value"], result["value"]
+        # Cambio relativo, positivo si mejora
+        change = (new - old) / old if result["higher_is_better"] else (old - new) / old
+        flag = ""
+        if change < -threshold:
+            flag = "  REGRESIÓN"
+            regressions.append(name)
+        print(f"{name:<20} {old:>14.2f} {new:>14.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=list(BENCHMARKS),
+        default=list(BENCHMARKS),
+        help="Benchmarks a ejecutar (por defecto todos)",
+    )
+    parser.add_argument(
+        "--output", default=None, help="Archivo JSON donde guardar los resultados"
+    )
+    parser.add_argument(
+        "--compare", default=None, help="Archivo JSON de baseline contra el cual comparar"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Empeoramiento relativo a partir del cual se marca una regresión (0.2 = 20%%)",
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="Corre cada benchmark con 10 veces menos trabajo"
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.only, args.quick)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "machine": platform.machine(),
+                    "quick": args.quick,
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+        print(f"\nResultados guardados en: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if baseline.get("quick") != args.quick:
+            print("\nAviso: el baseline se generó con otro valor de --quick")
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"\nRegresiones: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nSin regresiones.")
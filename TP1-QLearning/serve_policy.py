@@ -0,0 +1,98 @@
+"""Sirve una política exportada (ver utilidades/policy.py) para consultas de acciones en lote.
+
+Por entrada estándar (una consulta por línea, una respuesta por línea):
+
+    echo '{"states": [12, 40, 7]}' | python serve_policy.py
+
+Por HTTP (POST /act con el mismo JSON):
+
+    python serve_policy.py --port 8000
+    curl -d '{"states": [12, 40, 7]}' http://localhost:8000/act
+
+La respuesta es {"actions": [...]}, con una acción por estado en el mismo orden.
+"""
+
+import argparse
+import json
+import os
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from utilidades.policy import Policy
+
+
+def answer(policy, request):
+    """Responde una consulta {"states": [...]}; lanza ValueError si es inválida."""
+    if isinstance(request, dict):
+        request = request.get("states")
+    if isinstance(request, list) and not request:
+        return {"actions": []}
+    states = np.asarray(request)
+    if states.ndim != 1 or not np.issubdtype(states.dtype, np.integer):
+        raise ValueError('Se espera {"states": [...]} con una lista de enteros')
+    if len(states) and (states.min() < 0 or states.max() >= len(policy.actions)):
+        raise ValueError(f"Los estados deben estar entre 0 y {len(policy.actions) - 1}")
+    return {"actions": policy.act_batch(states).tolist()}
+
+
+def serve_stdin(policy):
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            response = answer(policy, json.loads(line))
+        except ValueError as error:  # json.JSONDecodeError también es un ValueError
+            response = {"error": str(error)}
+        print(json.dumps(response), flush=True)
+
+
+def serve_http(policy, host, port):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/act":
+                self.send_error(404)
+                return
+            try:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, response = 200, answer(policy, json.loads(body))
+            except ValueError as error:
+                status, response = 400, {"error": str(error)}
+            data = json.dumps(response).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # Sin un log por consulta
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"Sirviendo la política en http://{host}:{port}/act", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    base_dirpath = os.path.dirname(os.path.abspath(__file__)) # ./TP1-QLearning
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--policy",
+        default=os.path.join(base_dirpath, "results", "final_policy.npy"),
+        help="Política exportada por train.py (por defecto results/final_policy.npy)",
+    )
+    parser.add_argument(
+        "--port", type=int, default=None, help="Sirve por HTTP en este puerto (sin --port: stdin)"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args()
+
+    policy = Policy.load(args.policy)
+    if args.port is None:
+        serve_stdin(policy)
+    else:
+        serve_http(policy, args.host, args.port)
@@ -1,14 +1,40 @@
 import time
-import numpy as np
 from utilidades.taxi_env import TaxiEnvCustom, generate_city_blocks, remove_obstacles
-from utilidades.generales import clear_or_create_folder
-from utilidades.graficar import generar_video
+from utilidades.generales import clear_or_create_folder, existing_q_table_path, load_q_table
+from utilidades.frame_pipeline import FramePipeline
+from utilidades.policy import Policy
 import os
 import argparse
 
 
-def save_step(save_step_path, num):
-    env.save_render(img_path=os.path.join(save_step_path, f"step_{num:02}.png"))
+def simulate(env, policy, render=True, frame_interval=0.1):
+    """Simula un episodio con la política (greedy) dada y devuelve cada cuadro renderizado.
+
+    Es un generador: cada cuadro se produce recién cuando se lo pide, así se puede
+    enviar a los hilos de FramePipeline sin esperar a que se escriba en disco. Con
+    render=True los cuadros se muestran cada frame_interval segundos; el tiempo que
+    tarda quien consume el cuadro se descuenta de esa espera.
+    """
+    state = env.reset()
+    done = False
+    step_number = 0
+
+    env.render()
+    next_frame_time = time.perf_counter() + frame_interval
+    yield env.get_frame()
+
+    while not done:
+        action = policy.act(state)
+        state, reward, done, _ = env.step(action)
+        step_number += 1
+
+        if render:
+            time.sleep(max(0.0, next_frame_time - time.perf_counter()))
+        env.render()
+        next_frame_time = time.perf_counter() + frame_interval
+
+        print(f"Step {step_number} - Reward: {reward}")
+        yield env.get_frame()
 
 
 if __name__ == "__main__":
@@ -19,15 +45,40 @@ if __name__ == "__main__":
         action="store_true",
         help="Genera un video al final con los pasos de la simulación",
     )
-    parser.set_defaults(render=True)
+    parser.add_argument(
+        "--q-table",
+        default=None,
+        help="Ruta de la Q-table a simular, .npy o .npz guardada con save_q_table "
+        "(por defecto results/final_q_table.npz, o .npy si no existe)",
+    )
+    parser.add_argument(
+        "--policy",
+        default=None,
+        help="Ruta de una política exportada por train.py (results/final_policy.npy); "
+        "si se indica, se usa en lugar de la Q-table",
+    )
+    parser.add_argument(
+        "--no-steps",
+        dest="save_steps",
+        action="store_false",
+        help="No guarda la imagen de cada paso en results/best_result/img",
+    )
+    parser.set_defaults(render=True, save_steps=True)
     args = parser.parse_args()
 
     base_dirpath = os.path.dirname(os.path.abspath(__file__)) # ./TP1-QLearning
     results_dirpath = os.path.join(base_dirpath, "results") # ./TP1-QLearning/results
     best_result_dirpath = os.path.join(results_dirpath, "best_result") # ./TP1-QLearning/results/best_result
-    q_table_path = os.path.join(results_dirpath, "final_q_table.npy") # ./TP1-QLearning/results/final_q_table.npy
+    q_table_path = existing_q_table_path(
+        args.q_table or os.path.join(results_dirpath, "final_q_table.npz")
+    ) # ./TP1-QLearning/results/final_q_table.npz (o .npy)
     save_step_dirpath = os.path.join(best_result_dirpath, "img") # ./TP1-QLearning/results/best_result/img
     img_dirpath = os.path.join(base_dirpath, "img") # ./TP1-QLearning/img
+
+    # Se verifica antes de borrar los cuadros de la simulación anterior
+    input_path = args.policy or q_table_path
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"No se encontró la Q-table o política en: {input_path}")
     clear_or_create_folder(save_step_dirpath)
 
     GRID_SIZE = 10
@@ -37,46 +88,32 @@ if __name__ == "__main__":
         generate_city_blocks(GRID_SIZE), PICKUP_LOCATIONS + DROPOFF_LOCATIONS
     )
 
+    policy = Policy.load(args.policy) if args.policy else None
     env = TaxiEnvCustom(
         GRID_SIZE,
         PICKUP_LOCATIONS,
         DROPOFF_LOCATIONS,
         OBSTACLES,
         img_base_path=img_dirpath,
+        headless=not args.render,  # Sin ventana: los cuadros se dibujan en memoria
+        # Una política exportada usa la numeración de estados con la que se entrenó
+        compact_states=bool(policy and policy.metadata.get("compact_states")),
     )
 
-    if not os.path.exists(q_table_path):
-        raise FileNotFoundError(f"No se encontró la Q-table en: {q_table_path}")
-    q_table = np.load(q_table_path)
-
-    state = env.reset()
-    done = False
-    step_number = 0
-
-    if args.render:
-        env.render()
+    if policy is not None:
+        policy.check_env(env)
+    else:
+        policy = Policy.from_q_table(load_q_table(q_table_path, env), env)
 
-    env.save_render(
-        img_path=os.path.join(save_step_dirpath, f"step_{step_number:02}.png")
-    )
-
-    while not done:
-        action = np.argmax(q_table[state])
-        state, reward, done, _ = env.step(action)
-
-        if args.render:
-            env.render()
-            time.sleep(0.1)
-
-        env.save_render(
-            img_path=os.path.join(save_step_dirpath, f"step_{step_number:02}.png")
-        )
-        print(f"Step {step_number} - Reward: {reward}")
-        step_number += 1
+    # Los cuadros van directo del render a los hilos que escriben los PNG y el video
+    video_path = os.path.join(best_result_dirpath, "simulacion.gif") if args.video else None
+    with FramePipeline(
+        save_step_path=save_step_dirpath if args.save_steps else None,
+        video_path=video_path,
+        fps=5,
+    ) as pipeline:
+        for step_number, frame in enumerate(simulate(env, policy, render=args.render)):
+            pipeline.put(step_number, frame)
 
     if args.video:
-        video_path = os.path.join(
-            best_result_dirpath, "simulacion.gif"
-        )
-        generar_video(save_step_dirpath, video_path, fps=5)
         print(f"🎬 Video guardado en: {video_path}")
@@ -0,0 +1,16 @@
+from utilidades import cli
+from utilidades.algoritmos_rl import q_learning
+from utilidades.policy import Policy
+
+
+def test_evaluate_compact_policy(tmp_path, capsys):
+    env = cli.make_env(compact_states=True)
+    _, q_table = q_learning(0.5, 0.9, 0.2, env, episodes=200, seed=0)
+    policy_path = str(tmp_path / "policy.npy")
+    Policy.from_q_table(q_table, env).save(policy_path)
+
+    cli.main(["evaluate", "--policy", policy_path, "--episodes", "5", "--seed", "0"])
+
+    output = capsys.readouterr().out
+    assert "Reward promedio (5 episodios)" in output
+    assert "Evaluación exacta" in output
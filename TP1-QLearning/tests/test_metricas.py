@@ -0,0 +1,49 @@
+import csv
+
+from utilidades.algoritmos_rl import q_learning
+from utilidades.cli import make_env
+from utilidades.early_stopping import EarlyStopping
+from utilidades.metricas import CSVMetricsSink
+
+
+def read_episodes(file_path):
+    with open(file_path, newline="") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == CSVMetricsSink.header
+    return [int(row[0]) for row in rows[1:]]
+
+
+def test_csv_sink_includes_last_partial_window(tmp_path):
+    csv_path = tmp_path / "metrics.csv"
+    sink = CSVMetricsSink(csv_path)
+    q_learning(0.5, 0.9, 0.2, make_env(), episodes=250, callback=sink, callback_every=100, seed=0)
+    sink.close()
+
+    assert read_episodes(csv_path) == list(range(1, 251))
+
+
+def test_csv_sink_includes_episodes_after_early_stopping(tmp_path):
+    csv_path = tmp_path / "metrics.csv"
+    sink = CSVMetricsSink(csv_path)
+    early_stopping = EarlyStopping(policy_patience=5, min_episodes=10)
+    _, _, rewards, _, _ = q_learning(
+        0.5, 0.9, 0.0, make_env(), episodes=1000, graficar_aprendizaje=True,
+        callback=sink, callback_every=100, seed=0, early_stopping=early_stopping,
+    )
+    sink.close()
+
+    assert early_stopping.stopped_episode % 100 != 0
+    assert read_episodes(csv_path) == list(range(1, len(rewards) + 1))
+
+
+def test_csv_sink_resume_does_not_repeat_episodes(tmp_path):
+    csv_path = tmp_path / "metrics.csv"
+    sink = CSVMetricsSink(csv_path)
+    q_learning(0.5, 0.9, 0.2, make_env(), episodes=250, callback=sink, callback_every=100, seed=0)
+    sink.close()
+
+    sink = CSVMetricsSink(csv_path, append=True, truncate_after=250)
+    q_learning(0.5, 0.9, 0.2, make_env(), episodes=300, callback=sink, callback_every=100, seed=0)
+    sink.close()
+
+    assert read_episodes(csv_path) == list(range(1, 301))
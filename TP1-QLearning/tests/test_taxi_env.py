@@ -0,0 +1,18 @@
+import numpy as np
+
+from utilidades.cli import DROPOFF_LOCATIONS, GRID_SIZE, PICKUP_LOCATIONS, make_env
+from utilidades.taxi_env import TaxiVecEnv
+
+
+def test_vec_env_step_matches_compiled_env():
+    env = make_env()
+    vec_env = TaxiVecEnv(GRID_SIZE, PICKUP_LOCATIONS, DROPOFF_LOCATIONS, env.obstacles, seed=0)
+    rng = np.random.default_rng(0)
+    states = vec_env.reset(8)
+    for _ in range(500):
+        actions = rng.integers(0, vec_env.action_space, size=8)
+        next_states, rewards, dones, info = vec_env.step(actions)
+        np.testing.assert_array_equal(info["final_state"], env.next_state_table[states, actions])
+        np.testing.assert_array_equal(rewards, env.reward_table[states, actions])
+        np.testing.assert_array_equal(dones, env.done_table[states, actions])
+        states = next_states
@@ -1,18 +1,45 @@
-import optuna
 import numpy as np
 import os
 import csv
-from utilidades.taxi_env import TaxiEnvCustom, remove_obstacles, generate_city_blocks
-from utilidades.algoritmos_rl import q_learning
-from utilidades.graficar import plot_learning_curve, plot_study_results
-from utilidades.evaluate import evaluate_q_table
-from tabulate import tabulate
+import argparse
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from utilidades.taxi_env import (
+    TaxiEnvCustom,
+    TaxiVecEnv,
+    remove_obstacles,
+    generate_city_blocks,
+)
+from utilidades.algoritmos_rl import q_learning, q_learning_batch, q_learning_hogwild, dyna_q, q_lambda
+from utilidades.graficar import BackgroundPlotter, plot_learning_curve, plot_study_results
+from utilidades.evaluate import evaluate_q_table, evaluate_q_table_exact, sample_start_states
+from utilidades.planning import value_iteration
+from utilidades.checkpoint import load_checkpoint_state
+from utilidades.metricas import CSVMetricsSink
+from utilidades.policy import Policy
+from utilidades.trial_cache import TrialCache, config_key, env_config
+from utilidades.early_stopping import EarlyStopping
+from utilidades.generales import clear_or_create_folder, save_q_table
+from utilidades.leaderboard import (
+    evaluate_q_table_stack,
+    load_q_table_stack,
+    rank_trials,
+    write_leaderboard,
+    write_q_table_stack,
+)
 
 # Configuración de rutas
 base_dirpath = os.path.dirname(os.path.abspath(__file__)) # ./TP1-QLearning
 results_dirpath = os.path.join(base_dirpath, "results") # ./TP1-QLearning/results
-best_q_table_filepath = os.path.join(results_dirpath, "best_q_table.npy") # ./TP1-QLearning/results/best_q_table.npy
+best_q_table_filepath = os.path.join(results_dirpath, "best_q_table.npz") # ./TP1-QLearning/results/best_q_table.npz
 best_result_dirpath = os.path.join(results_dirpath, "best_result") # ./TP1-QLearning/results/best_result
+trials_dirpath = os.path.join(results_dirpath, "trials") # ./TP1-QLearning/results/trials
+final_checkpoint_dirpath = os.path.join(results_dirpath, "checkpoint") # ./TP1-QLearning/results/checkpoint
+default_storage_filepath = os.path.join(results_dirpath, "optuna_journal.log") # ./TP1-QLearning/results/optuna_journal.log
+default_cache_filepath = os.path.join(results_dirpath, "trial_cache.db") # ./TP1-QLearning/results/trial_cache.db
+trial_results_filepath = os.path.join(results_dirpath, "trial_results.csv") # ./TP1-QLearning/results/trial_results.csv
+trial_q_tables_filepath = os.path.join(results_dirpath, "trial_q_tables.npy") # ./TP1-QLearning/results/trial_q_tables.npy
+leaderboard_filepath = os.path.join(results_dirpath, "leaderboard.csv") # ./TP1-QLearning/results/leaderboard.csv
 
 GRID_SIZE = 10
 PICKUP_LOCATIONS = [(1, 1), (8, 7), (4, 2), (2, 8)]
@@ -21,38 +48,422 @@ OBSTACLES = remove_obstacles(
     generate_city_blocks(GRID_SIZE), PICKUP_LOCATIONS + DROPOFF_LOCATIONS
 )
 
-taxi_env = TaxiEnvCustom(GRID_SIZE, PICKUP_LOCATIONS, DROPOFF_LOCATIONS, OBSTACLES)
+taxi_env = TaxiEnvCustom(
+    GRID_SIZE, PICKUP_LOCATIONS, DROPOFF_LOCATIONS, OBSTACLES, compiled=True
+)
+taxi_vec_env = TaxiVecEnv(GRID_SIZE, PICKUP_LOCATIONS, DROPOFF_LOCATIONS, OBSTACLES)
 
-# Variable global para rastrear la mejor recompensa promedio
-best_avg_reward = -float("inf")  # Inicializar con un valor muy bajo
 
+def configure_env(compact_states):
+    """Vuelve a crear los entornos con la numeración de estados pedida (ver StateIndex).
 
-def objective(trial):
-    """Función objetivo para Optuna."""
-    global best_avg_reward  # Usar la variable global para rastrear la mejor recompensa promedio
+    Se llama al comienzo y en cada proceso del pool, para que todos entrenen y guarden
+    las Q-tables con la misma numeración.
+    """
+    global taxi_env, taxi_vec_env
+    if taxi_env.state_index.compact == compact_states:
+        return
+    taxi_env = TaxiEnvCustom(
+        GRID_SIZE,
+        PICKUP_LOCATIONS,
+        DROPOFF_LOCATIONS,
+        OBSTACLES,
+        compiled=True,
+        compact_states=compact_states,
+    )
+    taxi_vec_env = TaxiVecEnv(
+        GRID_SIZE, PICKUP_LOCATIONS, DROPOFF_LOCATIONS, OBSTACLES, compact_states=compact_states
+    )
 
-    # Sugerir valores para los hiperparámetros
+TRIAL_EPISODES = 2000  # Episodios de entrenamiento de cada trial
+REPORT_EVERY = 100  # Cada cuántos episodios se informa la recompensa al pruner
+
+
+def suggest_params(trial):
+    """Sugiere valores para los hiperparámetros de un trial."""
     alpha = trial.suggest_float("alpha", 0.1, 0.5, log=True)
     gamma = trial.suggest_float("gamma", 0.7, 0.99)
     epsilon = trial.suggest_float("epsilon", 0.1, 1.0)
+    return alpha, gamma, epsilon
+
+
+def make_pruner(name, trial_episodes=TRIAL_EPISODES):
+    """Devuelve el pruner de Optuna correspondiente al nombre dado (trial_episodes: largo de cada trial)."""
+    import optuna  # Se importa solo si se ejecuta el estudio (no con --resume)
+
+    if name == "median":
+        return optuna.pruners.MedianPruner(n_warmup_steps=5 * REPORT_EVERY)
+    if name == "halving":
+        return optuna.pruners.SuccessiveHalvingPruner(min_resource=REPORT_EVERY)
+    if name == "hyperband":
+        return optuna.pruners.HyperbandPruner(
+            min_resource=REPORT_EVERY, max_resource=trial_episodes
+        )
+    return optuna.pruners.NopPruner()
+
+
+def save_trial_q_table(trial, q_table):
+    """Guarda la Q-table del trial de forma atómica y registra su ruta en el trial.
 
-    # Entrenar el agente con los hiperparámetros sugeridos
-    avg_reward, q_table = q_learning(
-        alpha, gamma, epsilon, env=taxi_env, episodes=2000
+    Se guarda con save_q_table (con el mapa de estados y el dtype de almacenamiento del
+    estudio). Cada trial escribe su propio archivo, por lo que varios procesos pueden
+    ejecutar trials en simultáneo sin pisarse.
+    """
+    q_table_filepath = os.path.join(trials_dirpath, f"trial_{trial.number:04}.npz")
+    save_q_table(
+        q_table_filepath, q_table, taxi_env, dtype=trial.study.user_attrs.get("q_dtype")
     )
+    trial.set_user_attr("q_table_path", q_table_filepath)
 
-    # Guardar la mejor Q-table si es la mejor recompensa promedio hasta ahora
-    if avg_reward > best_avg_reward:
-        best_avg_reward = avg_reward
-        np.save(best_q_table_filepath, q_table)
 
-    return avg_reward
+def trial_score(trial, avg_reward, q_table):
+    """Valor del trial: la recompensa de entrenamiento o, si el estudio lo pide, la evaluación exacta."""
+    if trial.study.user_attrs.get("exact_eval"):
+        return evaluate_q_table_exact(q_table, taxi_env)["mean_reward"]
+    return float(avg_reward)
 
 
-if __name__ == "__main__":
-    # Crear un estudio de Optuna
-    study = optuna.create_study(direction="maximize")
-    study.optimize(objective, n_trials=100)  # Probar 50 combinaciones
+def trial_seed(study):
+    """Semilla de los trials: la misma para todos, así se comparan con los mismos sorteos."""
+    return study.user_attrs.get("seed")
+
+
+TRIAL_RESULTS_HEADER = [
+    "Trial",
+    "Alpha",
+    "Gamma",
+    "Epsilon",
+    "Recompensa promedio",
+    "Mejor",
+    "Estado",
+    "Cache",
+]
+
+# Una conexión a la caché de trials por proceso
+_trial_caches = {}
+
+
+def get_trial_cache(study):
+    """Caché de resultados de trials del estudio, o None si está desactivada."""
+    cache_path = study.user_attrs.get("cache_path")
+    if not cache_path:
+        return None
+    if cache_path not in _trial_caches:
+        _trial_caches[cache_path] = TrialCache(cache_path)
+    return _trial_caches[cache_path]
+
+
+def trial_config(study, alpha, gamma, epsilon, algorithm):
+    """Todo lo que determina el resultado de un trial: su hash es la clave en la caché."""
+    study_attrs = study.user_attrs
+    return {
+        "alpha": alpha,
+        "gamma": gamma,
+        "epsilon": epsilon,
+        "episodes": study_attrs.get("trial_episodes", TRIAL_EPISODES),
+        "seed": study_attrs.get("seed"),
+        "algorithm": algorithm,
+        "planning_steps": study_attrs.get("planning_steps", 0),
+        "prioritized": study_attrs.get("prioritized", False),
+        "trace_lambda": study_attrs.get("trace_lambda", 0),
+        "score": "exact" if study_attrs.get("exact_eval") else "train",
+        "early_stopping": study_attrs.get("early_stopping", 0),
+        "env": env_config(taxi_env),
+    }
+
+
+def load_cached_trial(trial, config):
+    """Si la configuración ya se evaluó, copia su Q-table al trial y devuelve su valor."""
+    cache = get_trial_cache(trial.study)
+    cached = cache.get(config_key(config)) if cache is not None else None
+    if cached is None:
+        return None
+    value, q_table_path = cached
+    save_trial_q_table(trial, np.load(q_table_path))
+    trial.set_user_attr("cached", True)
+    return value
+
+
+def finish_trial(trial, config, q_table, value):
+    """Guarda la Q-table del trial y registra su resultado en la caché (salvo que config sea None)."""
+    save_trial_q_table(trial, q_table)
+    cache = get_trial_cache(trial.study) if config is not None else None
+    if cache is not None:
+        cache.put(config_key(config), config, value, q_table)
+    return value
+
+
+def trial_row(trial, best_number=None):
+    """Fila de trial_results.csv para un trial terminado."""
+    return [
+        trial.number,
+        trial.params["alpha"],
+        trial.params["gamma"],
+        trial.params["epsilon"],
+        trial.value,
+        "" if best_number is None else "Yes" if trial.number == best_number else "No",
+        trial.state.name,
+        "Yes" if trial.user_attrs.get("cached") else "No",
+    ]
+
+
+def stream_trial_result(study, trial):
+    """Callback de Optuna: agrega la fila del trial a trial_results.csv apenas termina."""
+    with open(trial_results_filepath, mode="a", newline="") as file:
+        csv.writer(file).writerow(trial_row(trial))
+
+
+def objective(trial):
+    """Función objetivo para Optuna."""
+    import optuna
+
+    # Sugerir valores para los hiperparámetros
+    alpha, gamma, epsilon = suggest_params(trial)
+
+    study_attrs = trial.study.user_attrs
+    if study_attrs.get("planning_steps"):
+        algorithm_name = "dyna_q"
+    elif study_attrs.get("trace_lambda"):
+        algorithm_name = "q_lambda"
+    else:
+        algorithm_name = "q_learning"
+    config = trial_config(trial.study, alpha, gamma, epsilon, algorithm_name)
+    cached_value = load_cached_trial(trial, config)
+    if cached_value is not None:
+        return cached_value
+
+    def report_progress(episode, metrics):
+        """Informa la recompensa media móvil y corta el trial si el pruner lo indica."""
+        trial.report(metrics["avg_reward"], episode)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
+
+    # Entrenar el agente con los hiperparámetros sugeridos (con Dyna-Q o Q(λ) si el estudio lo pide)
+    kwargs = {}
+    algorithm = q_learning
+    if study_attrs.get("early_stopping"):
+        kwargs["early_stopping"] = EarlyStopping(policy_patience=study_attrs["early_stopping"])
+    if study_attrs.get("planning_steps"):
+        algorithm = dyna_q
+        kwargs = {
+            "planning_steps": study_attrs["planning_steps"],
+            "prioritized": study_attrs.get("prioritized", False),
+        }
+    elif study_attrs.get("trace_lambda"):
+        algorithm = q_lambda
+        kwargs = {"lambda_": study_attrs["trace_lambda"]}
+    avg_reward, q_table = algorithm(
+        alpha,
+        gamma,
+        epsilon,
+        env=taxi_env,
+        episodes=study_attrs.get("trial_episodes", TRIAL_EPISODES),
+        callback=report_progress,
+        callback_every=REPORT_EVERY,
+        seed=trial_seed(trial.study),
+        **kwargs,
+    )
+
+    return finish_trial(trial, config, q_table, trial_score(trial, avg_reward, q_table))
+
+
+def optimize_in_batches(study, n_trials, batch_size):
+    """Ejecuta los trials de a lotes, entrenando cada lote con q_learning_batch.
+
+    Estos trials no usan la caché: el resultado de cada configuración depende de las
+    demás configuraciones de su lote (comparten el generador aleatorio), por lo que no
+    se puede reproducir a partir de la configuración sola.
+    """
+    import optuna
+
+    for start in range(0, n_trials, batch_size):
+        trials = [study.ask() for _ in range(min(batch_size, n_trials - start))]
+        alphas, gammas, epsilons = zip(*[suggest_params(trial) for trial in trials])
+
+        pruned = set()
+
+        def report_progress(config, episode, metrics):
+            """Informa el progreso de cada configuración y la detiene si el pruner lo indica."""
+            trials[config].report(metrics["avg_reward"], episode)
+            if trials[config].should_prune():
+                pruned.add(config)
+                return True
+            return False
+
+        avg_rewards, q_tables = q_learning_batch(
+            alphas,
+            gammas,
+            epsilons,
+            env=taxi_vec_env,
+            episodes=study.user_attrs.get("trial_episodes", TRIAL_EPISODES),
+            callback=report_progress,
+            callback_every=REPORT_EVERY,
+            seed=trial_seed(study),
+        )
+
+        for config, (trial, avg_reward, q_table) in enumerate(
+            zip(trials, avg_rewards, q_tables)
+        ):
+            if config in pruned:
+                frozen_trial = study.tell(trial, state=optuna.trial.TrialState.PRUNED)
+            else:
+                value = trial_score(trial, avg_reward, q_table)
+                frozen_trial = study.tell(trial, finish_trial(trial, None, q_table, value))
+            stream_trial_result(study, frozen_trial)
+
+
+def get_storage(storage_path):
+    """Devuelve el storage de Optuna para la ruta dada (SQLite si termina en .db, sino journal)."""
+    import optuna
+
+    if storage_path.endswith(".db"):
+        return f"sqlite:///{storage_path}"
+    return optuna.storages.JournalStorage(
+        optuna.storages.journal.JournalFileBackend(storage_path)
+    )
+
+
+def make_sampler(seed):
+    """Sampler TPE; con semilla, un estudio repetido sugiere las mismas configuraciones (y usa la caché)."""
+    import optuna
+
+    return optuna.samplers.TPESampler(seed=seed)
+
+
+def run_worker(study_name, storage_path, n_trials, batch_size, pruner, trial_episodes=TRIAL_EPISODES, sampler_seed=None):
+    """Ejecuta n_trials del estudio compartido dentro de un proceso del pool."""
+    import optuna
+
+    # El pruner y el sampler no se guardan en el storage, por lo que cada proceso crea los suyos
+    study = optuna.load_study(
+        study_name=study_name,
+        storage=get_storage(storage_path),
+        pruner=make_pruner(pruner, trial_episodes),
+        sampler=make_sampler(sampler_seed),
+    )
+    configure_env(study.user_attrs.get("compact_states", False))
+    if batch_size > 1:
+        optimize_in_batches(study, n_trials, batch_size)
+    else:
+        study.optimize(objective, n_trials=n_trials, callbacks=[stream_trial_result])
+
+
+def optimize_in_parallel(study, n_trials, n_jobs, storage_path, batch_size, pruner, seed=None):
+    """Reparte los trials del estudio entre n_jobs procesos que comparten el storage."""
+    trials_per_job = [
+        n_trials // n_jobs + (1 if i < n_trials % n_jobs else 0) for i in range(n_jobs)
+    ]
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        futures = [
+            executor.submit(
+                run_worker,
+                study.study_name,
+                storage_path,
+                job_trials,
+                batch_size,
+                pruner,
+                study.user_attrs.get("trial_episodes", TRIAL_EPISODES),
+                # Cada proceso con su semilla, para que no sugieran todos lo mismo
+                None if seed is None else seed + job,
+            )
+            for job, job_trials in enumerate(trials_per_job)
+            if job_trials > 0
+        ]
+        for future in futures:
+            future.result()
+
+
+def run_leaderboard(args):
+    """Evalúa las Q-tables de trial_q_tables.npy en el mismo benchmark y guarda el ranking."""
+    from tabulate import tabulate
+
+    stack, trial_numbers = load_q_table_stack(trial_q_tables_filepath)
+    starts = sample_start_states(taxi_env, episodes=args.leaderboard, seed=args.seed)
+    results = evaluate_q_table_stack(stack, taxi_env, starts, n_jobs=args.n_jobs)
+    ranked = rank_trials(trial_numbers, results)
+    write_leaderboard(ranked, leaderboard_filepath)
+
+    print(f"\nRanking de los trials ({args.leaderboard} estados iniciales):")
+    print(
+        tabulate(
+            [[r["trial"], r["mean_reward"], r["success_rate"]] for r in ranked[:5]],
+            headers=["Trial", "Recompensa promedio", "Tasa de éxito"],
+            tablefmt="grid",
+        )
+    )
+    print(f"Ranking completo en: {leaderboard_filepath}")
+
+
+def run_study(args, plotter=None):
+    """Ejecuta el estudio de Optuna y guarda sus resultados y gráficos (en segundo plano con plotter)."""
+    import optuna
+    from tabulate import tabulate
+
+    # Crear un estudio de Optuna (con storage compartido si se ejecuta en paralelo)
+    storage_path = args.storage
+    if storage_path is None:
+        # Estudio nuevo: se descartan las Q-tables de ejecuciones anteriores
+        clear_or_create_folder(trials_dirpath)
+        if args.n_jobs > 1:
+            storage_path = default_storage_filepath
+            if os.path.exists(storage_path):
+                os.remove(storage_path)
+    else:
+        os.makedirs(trials_dirpath, exist_ok=True)
+
+    study = optuna.create_study(
+        direction="maximize",
+        study_name=args.study_name,
+        storage=get_storage(storage_path) if storage_path else None,
+        load_if_exists=True,
+        pruner=make_pruner(args.pruner, args.trial_episodes),
+        sampler=make_sampler(args.seed),
+    )
+    # Se guarda en el estudio para que también lo vean los procesos del pool
+    study.set_user_attr("exact_eval", args.exact_eval)
+    study.set_user_attr("seed", args.seed)
+    study.set_user_attr("trial_episodes", args.trial_episodes)
+    study.set_user_attr("planning_steps", args.planning_steps)
+    study.set_user_attr("prioritized", args.prioritized)
+    study.set_user_attr("trace_lambda", args.trace_lambda)
+    study.set_user_attr("cache_path", None if args.no_cache else args.cache)
+    study.set_user_attr("early_stopping", args.early_stopping)
+    study.set_user_attr("compact_states", args.compact_states)
+    study.set_user_attr("q_dtype", args.q_dtype)
+
+    # Cada trial agrega su fila a trial_results.csv al terminar; al final se reescribe completo
+    with open(trial_results_filepath, mode="w", newline="") as file:
+        csv.writer(file).writerow(TRIAL_RESULTS_HEADER)
+
+    if args.n_jobs > 1:
+        optimize_in_parallel(
+            study,
+            args.n_trials,
+            args.n_jobs,
+            storage_path,
+            args.batch_size,
+            args.pruner,
+            args.seed,
+        )
+    elif args.batch_size > 1:
+        optimize_in_batches(study, args.n_trials, args.batch_size)
+    else:
+        study.optimize(objective, n_trials=args.n_trials, callbacks=[stream_trial_result])
+
+    # Copiar la Q-table del mejor trial (elegido por el estudio, no por cada proceso)
+    shutil.copyfile(
+        study.best_trial.user_attrs["q_table_path"], best_q_table_filepath
+    )
+
+    # Juntar las Q-tables de todos los trials completos en un único archivo
+    q_table_paths = {
+        trial.number: trial.user_attrs["q_table_path"]
+        for trial in study.trials
+        if trial.state.name == "COMPLETE" and "q_table_path" in trial.user_attrs
+    }
+    write_q_table_stack(q_table_paths, trial_q_tables_filepath, compact_states=args.compact_states)
+    if args.leaderboard:
+        run_leaderboard(args)
 
     # Mostrar los mejores hiperparámetros
     print("\nMejores hiperparámetros:")
@@ -63,45 +474,236 @@ if __name__ == "__main__":
     print(study.best_value)
 
     print("\nGuardando resultados...")
-    trial_results_filepath = os.path.join(results_dirpath, "trial_results.csv")
     with open(trial_results_filepath, mode="w", newline="") as file:
         writer = csv.writer(file)
-        writer.writerow(
-            ["Trial", "Alpha", "Gamma", "Epsilon", "Recompensa promedio", "Mejor"]
-        )
+        writer.writerow(TRIAL_RESULTS_HEADER)
         for trial in study.trials:
-            is_best = "Yes" if trial.number == study.best_trial.number else "No"
-            writer.writerow(
-                [
-                    trial.number,
-                    trial.params["alpha"],
-                    trial.params["gamma"],
-                    trial.params["epsilon"],
-                    trial.value,
-                    is_best,
-                ]
-            )
+            writer.writerow(trial_row(trial, study.best_trial.number))
     print(f"Resultados guardados en: {trial_results_filepath}")
 
     # Guardar gráficos de estudio
     print("\nGuardando gráficos de estudio...")
-    plot_study_results(study, results_dirpath)
-    print(f"Gráficos guardados en: {results_dirpath}")
+    plot_study_results(study, results_dirpath, plotter=plotter)
+    if plotter is None:
+        print(f"Gráficos guardados en: {results_dirpath}")
+
+    return study
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n-trials", type=int, default=100)
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Cantidad de trials que se entrenan juntos con q_learning_batch (1: secuencial)",
+    )
+    parser.add_argument(
+        "--n-jobs",
+        type=int,
+        default=1,
+        help="Cantidad de procesos que ejecutan trials en paralelo",
+    )
+    parser.add_argument(
+        "--storage",
+        default=None,
+        help="Storage compartido del estudio (.db para SQLite, otro archivo para journal). "
+        "Si existe un estudio con el mismo nombre se continúa",
+    )
+    parser.add_argument("--study-name", default="taxi_q_learning")
+    parser.add_argument(
+        "--exact-eval",
+        action="store_true",
+        help="Rankea los trials con la evaluación exacta de la política greedy "
+        "sobre todos los estados iniciales, en lugar de la recompensa de entrenamiento",
+    )
+    parser.add_argument(
+        "--pruner",
+        choices=["none", "median", "halving", "hyperband"],
+        default="none",
+        help="Pruner de Optuna para cortar trials poco prometedores",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=0,
+        help="Guarda un checkpoint del entrenamiento final cada N episodios en "
+        "results/checkpoint (0: sin checkpoints)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Saltea el estudio y continúa el entrenamiento final desde el último "
+        "checkpoint de results/checkpoint",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Semilla para los trials, el entrenamiento final y las evaluaciones "
+        "(sin semilla cada ejecución es distinta; el entrenamiento final solo es "
+        "reproducible con --workers 1, el valor por defecto)",
+    )
+    parser.add_argument(
+        "--trial-episodes",
+        type=int,
+        default=TRIAL_EPISODES,
+        help=f"Episodios de entrenamiento de cada trial (por defecto {TRIAL_EPISODES})",
+    )
+    parser.add_argument(
+        "--planning-steps",
+        type=int,
+        default=0,
+        help="Entrena los trials con Dyna-Q haciendo K actualizaciones simuladas por "
+        "paso real (0: Q-Learning)",
+    )
+    parser.add_argument(
+        "--prioritized",
+        action="store_true",
+        help="Con --planning-steps, usa prioritized sweeping en lugar de sortear las "
+        "actualizaciones simuladas",
+    )
+    parser.add_argument(
+        "--trace-lambda",
+        type=float,
+        default=0.0,
+        metavar="LAMBDA",
+        help="Entrena los trials con Q(λ) de Watkins usando este lambda (0: Q-Learning)",
+    )
+    parser.add_argument(
+        "--cache",
+        default=default_cache_filepath,
+        help="Base SQLite con los resultados de trials ya evaluados (por defecto "
+        "results/trial_cache.db); las configuraciones que ya están no se vuelven a entrenar",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="No lee ni escribe la caché de trials"
+    )
+    parser.add_argument(
+        "--early-stopping",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Corta cada trial y el entrenamiento final cuando la política greedy no "
+        "cambia durante N episodios seguidos (0: siempre se entrenan todos los episodios)",
+    )
+    parser.add_argument(
+        "--leaderboard",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Al terminar el estudio evalúa las Q-tables de todos los trials desde los "
+        "mismos N estados iniciales y guarda el ranking en results/leaderboard.csv",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Procesos del entrenamiento final, que comparten la Q-table (Hogwild); "
+        "0: uno por CPU. Con más de un proceso el resultado no es determinista aunque "
+        "se indique --seed. Con checkpoints o --early-stopping se entrena en un solo proceso",
+    )
+    parser.add_argument(
+        "--compact-states",
+        action="store_true",
+        help="Numera solo los estados alcanzables (sin el taxi sobre un obstáculo): "
+        "Q-tables más chicas; las tablas guardadas llevan el mapa de estados",
+    )
+    parser.add_argument(
+        "--q-dtype",
+        choices=["float64", "float32", "float16"],
+        default="float64",
+        help="Precisión con la que se guardan las Q-tables (se entrena siempre en float64)",
+    )
+    parser.add_argument(
+        "--background-plots",
+        action="store_true",
+        help="Guarda los gráficos en un proceso aparte mientras sigue el entrenamiento",
+    )
+    args = parser.parse_args()
+    if args.planning_steps and args.batch_size > 1:
+        parser.error("--planning-steps no se puede combinar con --batch-size")
+    if args.trace_lambda and (args.planning_steps or args.batch_size > 1):
+        parser.error("--trace-lambda no se puede combinar con --planning-steps ni --batch-size")
+    if args.early_stopping and (args.planning_steps or args.trace_lambda or args.batch_size > 1):
+        parser.error("--early-stopping solo se puede usar con q_learning secuencial")
+
+    configure_env(args.compact_states)
+    plotter = BackgroundPlotter() if args.background_plots else None
+
+    if args.resume:
+        # Se saltea el estudio: los hiperparámetros salen del checkpoint
+        checkpoint = load_checkpoint_state(final_checkpoint_dirpath)
+        final_params = {
+            "alpha": checkpoint["params"]["alpha"],
+            "gamma": checkpoint["params"]["gamma"],
+            "epsilon": checkpoint["epsilon"],
+        }
+        print(f"Reanudando el entrenamiento final desde el episodio {checkpoint['episode']}")
+    else:
+        study = run_study(args, plotter)
+        final_params = study.best_params
 
     print("\n")
     print("-" * 80)
     print("Iniciando entrenamiento final con los mejores hiperparámetros...")
-    final_avg_reward, final_q_table, final_rewards, final_steps, final_success = (
-        q_learning(
-            alpha=study.best_params["alpha"],
-            gamma=study.best_params["gamma"],
-            epsilon=study.best_params["epsilon"],
-            env=taxi_env,
-            episodes=3000,  # o 50_000 si el entorno es grande
-            graficar_aprendizaje=True,
-        )
+    use_checkpoints = args.checkpoint_every > 0 or args.resume
+    # Las métricas se escriben a medida que avanza el entrenamiento, para poder seguirlo en vivo
+    final_metrics_filepath = os.path.join(results_dirpath, "final_metrics.csv")
+    metrics_sink = CSVMetricsSink(
+        final_metrics_filepath,
+        append=args.resume,
+        # Las filas posteriores al checkpoint se vuelven a escribir al reanudar
+        truncate_after=checkpoint["episode"] if args.resume else None,
+    )
+    early_stopping = (
+        EarlyStopping(policy_patience=args.early_stopping) if args.early_stopping else None
     )
+    final_episodes = 3000  # o 50_000 si el entorno es grande
+    n_workers = args.workers or os.cpu_count() or 1
+    if n_workers > 1 and not (use_checkpoints or early_stopping):
+        # Varios procesos sobre una Q-table compartida; las métricas se escriben al terminar
+        print(f"Entrenando con {n_workers} procesos (Hogwild)...")
+        final_avg_reward, final_q_table, final_rewards, final_steps, final_success = (
+            q_learning_hogwild(
+                alpha=final_params["alpha"],
+                gamma=final_params["gamma"],
+                epsilon=final_params["epsilon"],
+                env=taxi_env,
+                episodes=final_episodes,
+                graficar_aprendizaje=True,
+                n_workers=n_workers,
+                callback=metrics_sink,
+                callback_every=100,
+                seed=args.seed,
+            )
+        )
+    else:
+        final_avg_reward, final_q_table, final_rewards, final_steps, final_success = (
+            q_learning(
+                alpha=final_params["alpha"],
+                gamma=final_params["gamma"],
+                epsilon=final_params["epsilon"],
+                env=taxi_env,
+                episodes=final_episodes,
+                graficar_aprendizaje=True,
+                checkpoint_dir=final_checkpoint_dirpath if use_checkpoints else None,
+                checkpoint_every=args.checkpoint_every or 500,
+                resume_from=final_checkpoint_dirpath if args.resume else None,
+                callback=metrics_sink,
+                callback_every=100,
+                seed=args.seed,
+                early_stopping=early_stopping,
+            )
+        )
+    metrics_sink.close()
     print("Entrenamiento final completado.")
+    if early_stopping is not None and early_stopping.stopped_episode:
+        print(
+            f"La política convergió: entrenamiento cortado en el episodio "
+            f"{early_stopping.stopped_episode}"
+        )
 
     plot_learning_curve(
         final_rewards,
@@ -109,10 +711,37 @@ if __name__ == "__main__":
         success=final_success,
         window=50,
         save_path=os.path.join(results_dirpath, "learning_curve.png"),
+        plotter=plotter,
     )
 
-    np.save(os.path.join(results_dirpath, "final_q_table.npy"), final_q_table)
+    save_q_table(
+        os.path.join(results_dirpath, "final_q_table.npz"), final_q_table, taxi_env, dtype=args.q_dtype
+    )
+    # Política greedy lista para servir (serve_policy.py) o simular (test.py --policy)
+    Policy.from_q_table(final_q_table, taxi_env).save(
+        os.path.join(results_dirpath, "final_policy.npy")
+    )
 
-    score = evaluate_q_table(final_q_table, taxi_env, episodes=100)
+    score = evaluate_q_table(final_q_table, taxi_env, episodes=100, seed=args.seed)
     print(f"\nReward promedio con política final: {score}")
-    print("-" * 80)
\ No newline at end of file
+    exact = evaluate_q_table_exact(final_q_table, taxi_env)
+    print(
+        f"Evaluación exacta ({len(exact['starts'])} estados iniciales): "
+        f"reward promedio {exact['mean_reward']:.2f}, mínimo {exact['min_reward']:.2f}, "
+        f"tasa de éxito {exact['success_rate']:.2%}, ciclos {exact['loops'].sum()}"
+    )
+
+    # Referencia: política óptima del MDP calculada por iteración de valor
+    optimal_q_table, _ = value_iteration(taxi_env, gamma=final_params["gamma"])
+    save_q_table(
+        os.path.join(results_dirpath, "optimal_q_table.npz"), optimal_q_table, taxi_env, dtype=args.q_dtype
+    )
+    optimal_score = evaluate_q_table(
+        optimal_q_table, taxi_env, episodes=100, seed=args.seed
+    )
+    print(f"Reward promedio con política óptima (value iteration): {optimal_score}")
+    print("-" * 80)
+
+    if plotter is not None:
+        plotter.close()
+        print(f"Gráficos guardados en: {results_dirpath}")
@@ -1,23 +1,103 @@
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 import numpy as np
+from utilidades.checkpoint import open_q_table, save_checkpoint, load_checkpoint
 
-def q_learning(alpha, gamma, epsilon, env, episodes=1000, graficar_aprendizaje=False, epsilon_decay_rate=None):
-    """Entrena un agente Q-Learning con los hiperparámetros dados."""
-    q_table = np.zeros((env.state_space, env.action_space))
-    total_rewards = []
-    steps_per_episode = []
-    success_per_episode = []
-    max_epsilon = 1.0
-    min_epsilon = 0.01
+def q_learning(alpha, gamma, epsilon, env, episodes=1000, graficar_aprendizaje=False, epsilon_decay_rate=None, callback=None, callback_every=100, q_init=None, dtype=np.float64, checkpoint_dir=None, checkpoint_every=500, resume_from=None, seed=None, rng=None, early_stopping=None, q_table=None):
+    """Entrena un agente Q-Learning con los hiperparámetros dados.
 
-    for ep in range(episodes):
-        state = env.reset()
+    Las métricas por episodio se guardan en arreglos de NumPy preasignados (recompensa
+    float32, pasos int32 y éxito int8) y se devuelven recortados a los episodios jugados.
+
+    callback puede ser una función o una lista de funciones; cada callback_every
+    episodios se invoca callback(episodio, métricas), donde métricas tiene la
+    recompensa, los pasos y la tasa de éxito promedio de esos últimos episodios, el
+    epsilon actual y los arreglos de esos episodios (ver CSVMetricsSink). Si un
+    callback devuelve True el entrenamiento se detiene (también puede lanzar una
+    excepción, p. ej. optuna.TrialPruned). Al terminar (también por early stopping)
+    se invoca una vez más con los episodios que quedaron después de la última ventana
+    completa, si los hay.
+
+    q_init permite partir de una Q-table ya calculada (por ejemplo, la de value_iteration).
+    dtype define la precisión de la Q-table (float32 usa la mitad de memoria).
+
+    Con checkpoint_dir la Q-table de trabajo se mapea a disco (np.memmap) y cada
+    checkpoint_every episodios se guarda un checkpoint (Q-table, episodio, epsilon,
+    estado de los generadores aleatorios y métricas). resume_from continúa
+    exactamente desde el último checkpoint de esa carpeta, que pasa a ser también la
+    carpeta de checkpoints si no se indica otra.
+
+    La exploración usa un numpy.random.Generator: rng si se pasa, o uno nuevo creado
+    con seed. En ambos casos se reinicia también el generador del entorno a partir de
+    él, así una misma semilla reproduce exactamente el entrenamiento. Los sorteos de
+    exploración se generan en bloque al comenzar cada episodio.
+
+    early_stopping (un EarlyStopping) corta el entrenamiento cuando se cumple alguno de
+    sus criterios de convergencia; el episodio de corte queda en
+    early_stopping.stopped_episode. Sus contadores no se guardan en los checkpoints.
+
+    q_table permite entrenar directamente sobre un arreglo ya creado (por ejemplo, una
+    vista de memoria compartida, ver q_learning_hogwild) en lugar de una tabla nueva.
+    """
+    shape = (env.state_space, env.action_space)
+    rng, env_seed = _make_rng(seed, rng)
+    if resume_from and checkpoint_dir is None:
+        checkpoint_dir = resume_from
+
+    if q_table is not None:
+        if checkpoint_dir:
+            raise ValueError("q_table no se puede combinar con checkpoint_dir ni resume_from")
+    elif checkpoint_dir:
+        q_table = open_q_table(checkpoint_dir, shape, dtype)
+    else:
+        q_table = np.zeros(shape, dtype=dtype)
+    if q_init is not None:
+        q_table[:] = q_init
+    total_rewards = np.zeros(episodes, dtype=np.float32)
+    steps_per_episode = np.zeros(episodes, dtype=np.int32)
+    success_per_episode = np.zeros(episodes, dtype=np.int8)
+    callbacks = _as_callback_list(callback)
+    start_episode = 0
+
+    if resume_from:
+        checkpoint_q_table, checkpoint = load_checkpoint(resume_from)
+        q_table[:] = checkpoint_q_table
+        start_episode = checkpoint["episode"]
+        epsilon = checkpoint["epsilon"]
+        rng.bit_generator.state = checkpoint["rng_state"]
+        env.rng.bit_generator.state = checkpoint["env_rng_state"]
+        env_seed = None
+        total_rewards[:start_episode] = checkpoint["total_rewards"][:start_episode]
+        steps_per_episode[:start_episode] = checkpoint["steps_per_episode"][:start_episode]
+        success_per_episode[:start_episode] = checkpoint["success_per_episode"][:start_episode]
+
+    track_delta_q = early_stopping is not None and early_stopping.tracks_delta_q
+    track_policy = early_stopping is not None and early_stopping.tracks_policy
+    if track_policy:
+        # Acción greedy de cada estado, actualizada paso a paso (coincide con np.argmax)
+        greedy = np.argmax(q_table, axis=1).tolist()
+
+    episodes_run = start_episode
+    for ep in range(start_episode, episodes):
+        state = env.reset(seed=env_seed)
+        env_seed = None
         total_reward = 0
         steps = 0
         success = 0
+        max_td_error = 0.0
+        policy_changes = 0
 
-        for _ in range(200):  # Limitar a 200 pasos por episodio
-            if np.random.uniform(0, 1) < epsilon:
-                action = np.random.randint(0, env.action_space)
+        # Sorteos de exploración de todo el episodio en una sola llamada al generador
+        explore = (rng.random(200) < epsilon).tolist()
+        random_actions = rng.integers(0, env.action_space, size=200).tolist()
+
+        for t in range(200):  # Limitar a 200 pasos por episodio
+            if explore[t]:
+                action = random_actions[t]
+            elif track_policy:
+                action = greedy[state]
             else:
                 action = np.argmax(q_table[state])
 
@@ -30,7 +110,25 @@ def q_learning(alpha, gamma, epsilon, env, episodes=1000, graficar_aprendizaje=F
             td_target = reward + gamma * max_q_value_next_state # TD: Temporal Difference
             td_error = td_target - q_value_current_state
             q_table[state, action] = q_value_current_state + (alpha * td_error)
-            
+
+            if track_delta_q:
+                max_td_error = max(max_td_error, abs(td_error))
+            if track_policy:
+                # Solo puede cambiar la acción greedy del estado actualizado
+                greedy_action = greedy[state]
+                if action == greedy_action:
+                    if td_error < 0:
+                        new_greedy_action = int(np.argmax(q_table[state]))
+                        if new_greedy_action != greedy_action:
+                            greedy[state] = new_greedy_action
+                            policy_changes += 1
+                else:
+                    new_q_value = q_table[state, action]
+                    greedy_q_value = q_table[state, greedy_action]
+                    if new_q_value > greedy_q_value or (new_q_value == greedy_q_value and action < greedy_action):
+                        greedy[state] = action
+                        policy_changes += 1
+
             # Actualizar el estado actual
             state = next_state
             total_reward += reward
@@ -40,18 +138,601 @@ def q_learning(alpha, gamma, epsilon, env, episodes=1000, graficar_aprendizaje=F
                 success = 1
                 break
 
-        total_rewards.append(total_reward)
-        steps_per_episode.append(steps)
-        success_per_episode.append(success)
+        total_rewards[ep] = total_reward
+        steps_per_episode[ep] = steps
+        success_per_episode[ep] = success
+        episodes_run = ep + 1
+
+        # Actualizar epsilon si se proporciona una tasa de decaimiento
+        if epsilon_decay_rate:
+            epsilon = _decayed_epsilon(epsilon_decay_rate, ep)
+
+        # Guardar un checkpoint cada checkpoint_every episodios
+        if checkpoint_dir and (ep + 1) % checkpoint_every == 0:
+            save_checkpoint(
+                checkpoint_dir,
+                q_table,
+                {
+                    "episode": ep + 1,
+                    "epsilon": epsilon,
+                    "params": {"alpha": alpha, "gamma": gamma, "epsilon_decay_rate": epsilon_decay_rate},
+                    "rng_state": rng.bit_generator.state,
+                    "env_rng_state": env.rng.bit_generator.state,
+                    "total_rewards": total_rewards[:episodes_run],
+                    "steps_per_episode": steps_per_episode[:episodes_run],
+                    "success_per_episode": success_per_episode[:episodes_run],
+                },
+            )
+
+        # Informar el progreso cada callback_every episodios
+        if callbacks and episodes_run % callback_every == 0:
+            if _notify_callbacks(
+                callbacks, episodes_run, callback_every, epsilon, total_rewards, steps_per_episode, success_per_episode
+            ):
+                break
+
+        # Cortar si el entrenamiento ya convergió
+        if early_stopping is not None and early_stopping.update(
+            episodes_run, alpha * max_td_error, policy_changes, total_reward, success
+        ):
+            break
+
+    # Informar también los episodios de la última ventana incompleta
+    if episodes_run > start_episode:
+        _notify_partial_window(
+            callbacks, episodes_run, callback_every, epsilon, total_rewards, steps_per_episode, success_per_episode
+        )
+
+    if checkpoint_dir:
+        q_table.flush()
+
+    # Recortar las métricas a los episodios efectivamente jugados
+    total_rewards = total_rewards[:episodes_run]
+    steps_per_episode = steps_per_episode[:episodes_run]
+    success_per_episode = success_per_episode[:episodes_run]
+
+    # Calcular la recompensa promedio de los últimos 100 episodios
+    avg_reward = np.mean(total_rewards[-100:], dtype=np.float64)
+
+    if graficar_aprendizaje:
+        return avg_reward, q_table, total_rewards, steps_per_episode, success_per_episode
+    else:
+        return avg_reward, q_table
+
+
+def dyna_q(alpha, gamma, epsilon, env, episodes=1000, graficar_aprendizaje=False, epsilon_decay_rate=None, planning_steps=10, prioritized=False, theta=1e-4, callback=None, callback_every=100, q_init=None, dtype=np.float64, seed=None, rng=None):
+    """Entrena un agente Dyna-Q: Q-Learning más actualizaciones simuladas con un modelo aprendido.
+
+    Como el entorno es determinista, el modelo guarda en arreglos (state_space,
+    action_space) el estado siguiente, la recompensa y el fin de episodio de cada par
+    (estado, acción) observado. Luego de cada paso real se hacen planning_steps
+    actualizaciones simuladas:
+
+    - prioritized=False: sobre pares (estado, acción) ya observados elegidos al azar.
+    - prioritized=True (prioritized sweeping): sobre los pares de un heap ordenado por
+      el |error TD|. El par del paso real se encola con su |error TD| si supera theta
+      (en lugar de actualizarlo directamente) y, cada vez que se actualiza un par del
+      heap, se encolan los predecesores de su estado cuyo error supere theta; un par
+      que ya está en el heap solo se vuelve a encolar si su prioridad aumenta.
+
+    Los parámetros y los valores devueltos son los mismos que los de q_learning (sin
+    checkpoints).
+    """
+    n_actions = env.action_space
+    rng, env_seed = _make_rng(seed, rng)
+
+    q_table = np.zeros((env.state_space, n_actions), dtype=dtype)
+    if q_init is not None:
+        q_table[:] = q_init
+
+    # Modelo del entorno: -1 indica un par (estado, acción) todavía no observado
+    next_state_model = np.full((env.state_space, n_actions), -1, dtype=np.int64)
+    reward_model = np.zeros((env.state_space, n_actions), dtype=np.float32)
+    observed = []  # pares observados, para sortear las actualizaciones simuladas
+    predecessors = {}  # estado -> pares (estado, acción) que llevan a él
+    queue = []  # heap de (-prioridad, estado, acción)
+    queued_priority = np.zeros((env.state_space, n_actions))  # 0: el par no está en el heap
+
+    total_rewards = np.zeros(episodes, dtype=np.float32)
+    steps_per_episode = np.zeros(episodes, dtype=np.int32)
+    success_per_episode = np.zeros(episodes, dtype=np.int8)
+    callbacks = _as_callback_list(callback)
+
+    def update(s, a, r, s2):
+        """Actualización TD de Q(s, a); devuelve el |error TD| antes de actualizar."""
+        td_error = r + gamma * np.max(q_table[s2]) - q_table[s, a]
+        q_table[s, a] += alpha * td_error
+        return abs(td_error)
+
+    def push(s, a, priority):
+        """Encola (s, a) si su prioridad supera theta y la que ya tiene en el heap."""
+        if priority > theta and priority > queued_priority[s, a]:
+            queued_priority[s, a] = priority
+            heapq.heappush(queue, (-priority, s, a))
+
+    def push_predecessors(state):
+        """Encola los pares que llevan a state cuyo |error TD| supere theta."""
+        max_q_value = np.max(q_table[state])
+        for s, a in predecessors.get(state, ()):
+            push(s, a, abs(reward_model[s, a] + gamma * max_q_value - q_table[s, a]))
+
+    episodes_run = 0
+    for ep in range(episodes):
+        state = env.reset(seed=env_seed)
+        env_seed = None
+        total_reward = 0
+        steps = 0
+        success = 0
+
+        # Sorteos de exploración y de planificación de todo el episodio en bloque
+        explore = (rng.random(200) < epsilon).tolist()
+        random_actions = rng.integers(0, n_actions, size=200).tolist()
+        if not prioritized:
+            planning_draws = rng.random((200, planning_steps)).tolist()
+
+        for t in range(200):  # Limitar a 200 pasos por episodio
+            if explore[t]:
+                action = random_actions[t]
+            else:
+                action = int(np.argmax(q_table[state]))
+
+            next_state, reward, done, _ = env.step(action)
+
+            # Registrar la transición en el modelo
+            if next_state_model[state, action] < 0:
+                observed.append((state, action))
+                predecessors.setdefault(next_state, []).append((state, action))
+            next_state_model[state, action] = next_state
+            reward_model[state, action] = reward
+
+            if prioritized:
+                push(state, action, abs(reward + gamma * np.max(q_table[next_state]) - q_table[state, action]))
+                updates = 0
+                while queue and updates < planning_steps:
+                    priority, s, a = heapq.heappop(queue)
+                    if -priority != queued_priority[s, a]:
+                        continue  # entrada vieja: el par se volvió a encolar con más prioridad
+                    queued_priority[s, a] = 0
+                    update(s, a, reward_model[s, a], next_state_model[s, a])
+                    push_predecessors(s)
+                    updates += 1
+            else:
+                update(state, action, reward, next_state)
+                for u in planning_draws[t]:
+                    s, a = observed[int(u * len(observed))]
+                    update(s, a, reward_model[s, a], next_state_model[s, a])
+
+            state = next_state
+            total_reward += reward
+            steps += 1
+
+            if done:
+                success = 1
+                break
+
+        total_rewards[ep] = total_reward
+        steps_per_episode[ep] = steps
+        success_per_episode[ep] = success
+        episodes_run = ep + 1
+
+        # Actualizar epsilon si se proporciona una tasa de decaimiento
+        if epsilon_decay_rate:
+            epsilon = _decayed_epsilon(epsilon_decay_rate, ep)
+
+        # Informar el progreso cada callback_every episodios
+        if callbacks and episodes_run % callback_every == 0:
+            if _notify_callbacks(
+                callbacks, episodes_run, callback_every, epsilon, total_rewards, steps_per_episode, success_per_episode
+            ):
+                break
+
+    # Informar también los episodios de la última ventana incompleta
+    _notify_partial_window(
+        callbacks, episodes_run, callback_every, epsilon, total_rewards, steps_per_episode, success_per_episode
+    )
+
+    # Recortar las métricas a los episodios efectivamente jugados
+    total_rewards = total_rewards[:episodes_run]
+    steps_per_episode = steps_per_episode[:episodes_run]
+    success_per_episode = success_per_episode[:episodes_run]
+
+    # Calcular la recompensa promedio de los últimos 100 episodios
+    avg_reward = np.mean(total_rewards[-100:], dtype=np.float64)
+
+    if graficar_aprendizaje:
+        return avg_reward, q_table, total_rewards, steps_per_episode, success_per_episode
+    else:
+        return avg_reward, q_table
+
+
+def q_lambda(alpha, gamma, epsilon, env, episodes=1000, graficar_aprendizaje=False, epsilon_decay_rate=None, lambda_=0.9, trace_tol=1e-3, watkins=True, callback=None, callback_every=100, q_init=None, dtype=np.float64, seed=None, rng=None):
+    """Entrena un agente Q(λ): Q-Learning con trazas de elegibilidad.
+
+    Cada error TD se aplica a todos los pares (estado, acción) visitados recientemente,
+    ponderado por (gamma * lambda_) ** antigüedad, así la recompensa del dropoff se
+    propaga por toda la ruta en un solo episodio en lugar de un estado por visita.
+
+    Las trazas son de reemplazo y se guardan en forma dispersa: un diccionario
+    par -> paso de la última visita, en orden de visita. Los pares cuya traza quedaría
+    por debajo de trace_tol se descartan, por lo que la traza nunca supera
+    log(trace_tol) / log(gamma * lambda_) pares y cada paso cuesta O(largo de la traza)
+    en lugar de O(state_space * action_space). Con watkins=True (Q(λ) de Watkins) la
+    traza se corta al tomar una acción exploratoria no greedy; con watkins=False
+    (Q(λ) ingenuo) se conserva.
+
+    Los parámetros y los valores devueltos son los mismos que los de q_learning (sin
+    checkpoints).
+    """
+    n_actions = env.action_space
+    rng, env_seed = _make_rng(seed, rng)
+
+    q_table = np.zeros((env.state_space, n_actions), dtype=dtype)
+    if q_init is not None:
+        q_table[:] = q_init
+    q_flat = q_table.reshape(-1)  # vista: el par (s, a) es el índice s * n_actions + a
+
+    decay = gamma * lambda_
+    if 0 < decay < 1:
+        max_trace = max(1, int(np.ceil(np.log(trace_tol) / np.log(decay))))
+    else:
+        max_trace = 1 if decay <= 0 else 200  # sin decaimiento la traza dura todo el episodio
+    decay_powers = decay ** np.arange(max_trace)
+
+    total_rewards = np.zeros(episodes, dtype=np.float32)
+    steps_per_episode = np.zeros(episodes, dtype=np.int32)
+    success_per_episode = np.zeros(episodes, dtype=np.int8)
+    callbacks = _as_callback_list(callback)
+
+    episodes_run = 0
+    for ep in range(episodes):
+        state = env.reset(seed=env_seed)
+        env_seed = None
+        total_reward = 0
+        steps = 0
+        success = 0
+        trace = {}  # índice del par -> paso de su última visita (de más viejo a más nuevo)
+
+        # Sorteos de exploración de todo el episodio en una sola llamada al generador
+        explore = (rng.random(200) < epsilon).tolist()
+        random_actions = rng.integers(0, n_actions, size=200).tolist()
+
+        greedy_action = int(np.argmax(q_table[state]))
+        for t in range(200):  # Limitar a 200 pasos por episodio
+            action = random_actions[t] if explore[t] else greedy_action
+            if watkins and action != greedy_action:
+                trace.clear()  # Watkins: el retorno deja de seguir a la política greedy
+
+            next_state, reward, done, _ = env.step(action)
+            td_error = reward + gamma * np.max(q_table[next_state]) - q_table[state, action]
+
+            # Traza de reemplazo: el par pasa al final con antigüedad 0
+            pair = state * n_actions + action
+            trace.pop(pair, None)
+            trace[pair] = t
+            while t - next(iter(trace.values())) >= max_trace:
+                del trace[next(iter(trace))]
+
+            if len(trace) == 1:
+                q_flat[pair] += alpha * td_error
+            else:
+                pairs = np.fromiter(trace.keys(), dtype=np.int64, count=len(trace))
+                visits = np.fromiter(trace.values(), dtype=np.int64, count=len(trace))
+                q_flat[pairs] += (alpha * td_error) * decay_powers[t - visits]
+            greedy_action = int(np.argmax(q_table[next_state]))
+
+            state = next_state
+            total_reward += reward
+            steps += 1
+
+            if done:
+                success = 1
+                break
+
+        total_rewards[ep] = total_reward
+        steps_per_episode[ep] = steps
+        success_per_episode[ep] = success
+        episodes_run = ep + 1
 
         # Actualizar epsilon si se proporciona una tasa de decaimiento
         if epsilon_decay_rate:
-            epsilon = min_epsilon + (max_epsilon - min_epsilon) * np.exp(-epsilon_decay_rate * ep)
+            epsilon = _decayed_epsilon(epsilon_decay_rate, ep)
+
+        # Informar el progreso cada callback_every episodios
+        if callbacks and episodes_run % callback_every == 0:
+            if _notify_callbacks(
+                callbacks, episodes_run, callback_every, epsilon, total_rewards, steps_per_episode, success_per_episode
+            ):
+                break
+
+    # Informar también los episodios de la última ventana incompleta
+    _notify_partial_window(
+        callbacks, episodes_run, callback_every, epsilon, total_rewards, steps_per_episode, success_per_episode
+    )
+
+    # Recortar las métricas a los episodios efectivamente jugados
+    total_rewards = total_rewards[:episodes_run]
+    steps_per_episode = steps_per_episode[:episodes_run]
+    success_per_episode = success_per_episode[:episodes_run]
 
     # Calcular la recompensa promedio de los últimos 100 episodios
-    avg_reward = np.mean(total_rewards[-100:])
+    avg_reward = np.mean(total_rewards[-100:], dtype=np.float64)
 
     if graficar_aprendizaje:
         return avg_reward, q_table, total_rewards, steps_per_episode, success_per_episode
     else:
-        return avg_reward, q_table
\ No newline at end of file
+        return avg_reward, q_table
+
+def q_learning_hogwild(alpha, gamma, epsilon, env, episodes=1000, graficar_aprendizaje=False, epsilon_decay_rate=None, n_workers=None, callback=None, callback_every=100, q_init=None, dtype=np.float64, seed=None, rng=None):
+    """Entrena con Q-Learning en n_workers procesos que comparten una sola Q-table (Hogwild).
+
+    La Q-table vive en un bloque de multiprocessing.shared_memory. Cada proceso juega
+    su parte de los episodios con su propia copia del entorno y su propio generador
+    (derivados con SeedSequence.spawn de seed o rng) y aplica las actualizaciones TD
+    sobre la tabla compartida sin locks: como cada paso actualiza una sola celda, las
+    escrituras que se pisan son raras y no impiden la convergencia. Por defecto
+    n_workers es la cantidad de CPUs.
+
+    epsilon_decay_rate se escala por n_workers, así epsilon decae según la cantidad
+    total de episodios jugados. Las métricas de los procesos se intercalan al final
+    (el episodio k de cada proceso, en orden de proceso) y los callbacks se invocan
+    recién entonces, sobre las métricas ya combinadas; un True no corta nada.
+
+    Los valores devueltos son los mismos que los de q_learning (sin checkpoints ni
+    early stopping). El resultado no es determinista aunque se indique seed: depende
+    del orden en que los procesos leen y escriben la tabla compartida. Con n_workers=1
+    tampoco coincide con el de q_learning con la misma semilla, porque la semilla del
+    proceso se deriva de ella.
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    n_workers = max(1, min(n_workers, episodes))
+    shape = (env.state_space, env.action_space)
+    if rng is None:
+        seed_sequence = np.random.SeedSequence(seed)
+    else:
+        seed_sequence = np.random.SeedSequence(int(rng.integers(2**63)))
+    worker_seeds = seed_sequence.spawn(n_workers)
+    worker_episodes = [len(chunk) for chunk in np.array_split(np.arange(episodes), n_workers)]
+    worker_kwargs = {
+        "alpha": alpha,
+        "gamma": gamma,
+        "epsilon": epsilon,
+        "env": env,
+        "epsilon_decay_rate": epsilon_decay_rate * n_workers if epsilon_decay_rate else None,
+        "graficar_aprendizaje": True,
+    }
+
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    shared_q_table = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    try:
+        shared_q_table[:] = 0 if q_init is None else q_init
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [
+                executor.submit(
+                    _hogwild_worker, shm.name, shape, dtype, worker_episodes[w], worker_seeds[w], worker_kwargs
+                )
+                for w in range(n_workers)
+            ]
+            worker_metrics = [future.result() for future in futures]
+        q_table = shared_q_table.copy()
+    finally:
+        del shared_q_table  # La vista debe liberarse antes de cerrar el bloque
+        shm.close()
+        shm.unlink()
+
+    # Intercalar las métricas: primero el episodio 0 de cada proceso, luego el 1, etc.
+    local_episode = np.concatenate([np.arange(len(m[0])) for m in worker_metrics])
+    worker_ids = np.concatenate([np.full(len(m[0]), w) for w, m in enumerate(worker_metrics)])
+    order = np.lexsort((worker_ids, local_episode))
+    total_rewards, steps_per_episode, success_per_episode = (
+        np.concatenate([m[i] for m in worker_metrics])[order] for i in range(3)
+    )
+
+    callbacks = _as_callback_list(callback)
+    if callbacks:
+        for episodes_run in range(callback_every, len(total_rewards) + 1, callback_every):
+            epsilon_run = (
+                _decayed_epsilon(epsilon_decay_rate, episodes_run - 1) if epsilon_decay_rate else epsilon
+            )
+            _notify_callbacks(
+                callbacks, episodes_run, callback_every, epsilon_run,
+                total_rewards, steps_per_episode, success_per_episode,
+            )
+        _notify_partial_window(
+            callbacks, len(total_rewards), callback_every,
+            _decayed_epsilon(epsilon_decay_rate, len(total_rewards) - 1) if epsilon_decay_rate else epsilon,
+            total_rewards, steps_per_episode, success_per_episode,
+        )
+
+    # Calcular la recompensa promedio de los últimos 100 episodios
+    avg_reward = np.mean(total_rewards[-100:], dtype=np.float64)
+
+    if graficar_aprendizaje:
+        return avg_reward, q_table, total_rewards, steps_per_episode, success_per_episode
+    else:
+        return avg_reward, q_table
+
+
+def _hogwild_worker(shm_name, shape, dtype, episodes, seed_sequence, kwargs):
+    """Proceso de q_learning_hogwild: entrena sobre la Q-table compartida y devuelve sus métricas."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    q_table = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    result = None
+    try:
+        result = q_learning(
+            episodes=episodes, rng=np.random.default_rng(seed_sequence), q_table=q_table, **kwargs
+        )
+        return result[2:]  # recompensas, pasos y éxitos (sin la vista de la Q-table)
+    finally:
+        del q_table, result  # Las vistas deben liberarse antes de cerrar el bloque
+        shm.close()
+
+
+def _make_rng(seed, rng):
+    """Devuelve el generador del agente y la semilla con la que reiniciar el entorno (o None)."""
+    if rng is None:
+        rng = np.random.default_rng(seed)
+        if seed is None:
+            return rng, None
+    return rng, int(rng.integers(2**63))
+
+
+def _as_callback_list(callback):
+    """Normaliza callback (None, una función o una lista de funciones) a una lista."""
+    if isinstance(callback, (list, tuple)):
+        return list(callback)
+    return [callback] if callback else []
+
+
+def _decayed_epsilon(epsilon_decay_rate, episode, max_epsilon=1.0, min_epsilon=0.01):
+    """Epsilon con decaimiento exponencial luego de episode episodios."""
+    return min_epsilon + (max_epsilon - min_epsilon) * np.exp(-epsilon_decay_rate * episode)
+
+
+def _notify_callbacks(callbacks, episodes_run, window, epsilon, rewards, steps, success):
+    """Invoca los callbacks con las métricas de los últimos window episodios.
+
+    Devuelve True si alguno pide detener el entrenamiento.
+    """
+    last = slice(episodes_run - window, episodes_run)
+    metrics = rolling_metrics(
+        rewards[:episodes_run], steps[:episodes_run], success[:episodes_run], window
+    )
+    metrics.update(
+        epsilon=epsilon, rewards=rewards[last], steps=steps[last], success=success[last]
+    )
+    # Se evalúan todos los callbacks aunque alguno pida detener el entrenamiento
+    return any([cb(episodes_run, metrics) for cb in callbacks])
+
+
+def _notify_partial_window(callbacks, episodes_run, callback_every, epsilon, rewards, steps, success):
+    """Invoca los callbacks con los episodios jugados después de la última ventana completa.
+
+    Se llama al terminar el entrenamiento (también si lo cortó el early stopping), así
+    los callbacks reciben todos los episodios aunque episodes_run no sea múltiplo de
+    callback_every. Lo que devuelvan los callbacks se ignora.
+    """
+    window = episodes_run % callback_every
+    if callbacks and window:
+        _notify_callbacks(callbacks, episodes_run, window, epsilon, rewards, steps, success)
+
+
+def rolling_metrics(rewards, steps, success, window):
+    """Promedios de recompensa, pasos y éxito de los últimos window episodios."""
+    return {
+        "avg_reward": float(np.mean(rewards[-window:])),
+        "avg_steps": float(np.mean(steps[-window:])),
+        "success_rate": float(np.mean(success[-window:])),
+    }
+
+
+def q_learning_batch(alphas, gammas, epsilons, env, episodes=1000, graficar_aprendizaje=False, epsilon_decay_rate=None, seed=None, callback=None, callback_every=100, dtype=np.float64):
+    """Entrena K agentes Q-Learning en paralelo, uno por cada configuración de hiperparámetros.
+
+    env debe ser un TaxiVecEnv: cada configuración maneja su propio taxi y su propia
+    Q-table dentro de un tensor de forma (K, state_space, action_space). La selección
+    epsilon-greedy, el máximo sobre el estado siguiente y la actualización TD se hacen
+    de forma vectorizada para las K configuraciones a la vez.
+
+    Si se pasa un callback, se lo invoca como callback(k, episodio, métricas) cada vez
+    que la configuración k completa callback_every episodios; si devuelve True, esa
+    configuración deja de entrenar y su promedio se calcula con los episodios jugados.
+    Al terminar se invoca una vez más por cada configuración que no se detuvo y jugó
+    episodios después de su última ventana completa.
+
+    Con seed se reinicia también el generador del entorno a partir del del agente
+    (como en q_learning), así una misma semilla reproduce exactamente el entrenamiento.
+    """
+    alphas = np.asarray(alphas, dtype=float)
+    gammas = np.asarray(gammas, dtype=float)
+    epsilons = np.array(epsilons, dtype=float)
+    k = len(alphas)
+    rng, env_seed = _make_rng(seed, None)
+
+    q_tables = np.zeros((k, env.state_space, env.action_space), dtype=dtype)
+    total_rewards = np.zeros((k, episodes), dtype=np.float32)
+    steps_per_episode = np.zeros((k, episodes), dtype=np.int32)
+    success_per_episode = np.zeros((k, episodes), dtype=np.int8)
+    max_epsilon = 1.0
+    min_epsilon = 0.01
+
+    configs = np.arange(k)
+    episode_counts = np.zeros(k, dtype=int)
+    episode_rewards = np.zeros(k)
+    episode_steps = np.zeros(k, dtype=int)
+    stopped = np.zeros(k, dtype=bool)
+    states = env.reset(k, seed=env_seed)
+
+    while True:
+        active = (episode_counts < episodes) & ~stopped
+        if not active.any():
+            break
+
+        # Selección epsilon-greedy para todas las configuraciones
+        greedy_actions = np.argmax(q_tables[configs, states], axis=1)
+        random_actions = rng.integers(0, env.action_space, size=k)
+        actions = np.where(rng.random(k) < epsilons, random_actions, greedy_actions)
+
+        next_states, rewards, dones, info = env.step(actions)
+        final_states = info["final_state"]
+
+        # Actualización TD (solo para las configuraciones que siguen entrenando)
+        idx = configs[active]
+        q_values_current_state = q_tables[idx, states[idx], actions[idx]]
+        max_q_values_next_state = np.max(q_tables[idx, final_states[idx]], axis=1)
+        td_targets = rewards[idx] + gammas[idx] * max_q_values_next_state
+        td_errors = td_targets - q_values_current_state
+        q_tables[idx, states[idx], actions[idx]] = q_values_current_state + alphas[idx] * td_errors
+
+        episode_rewards += rewards
+        episode_steps += 1
+        states = next_states
+
+        # Registrar los episodios que terminaron en este paso
+        finished = configs[(dones | info["truncated"]) & active]
+        if len(finished):
+            ep = episode_counts[finished]
+            total_rewards[finished, ep] = episode_rewards[finished]
+            steps_per_episode[finished, ep] = episode_steps[finished]
+            success_per_episode[finished, ep] = dones[finished]
+            episode_rewards[finished] = 0
+            episode_steps[finished] = 0
+            episode_counts[finished] += 1
+
+            # Actualizar epsilon si se proporciona una tasa de decaimiento
+            if epsilon_decay_rate:
+                epsilons[finished] = min_epsilon + (max_epsilon - min_epsilon) * np.exp(-epsilon_decay_rate * ep)
+
+            # Informar el progreso de las configuraciones que completaron callback_every episodios
+            if callback:
+                for config in finished[episode_counts[finished] % callback_every == 0]:
+                    n = episode_counts[config]
+                    metrics = rolling_metrics(
+                        total_rewards[config, :n],
+                        steps_per_episode[config, :n],
+                        success_per_episode[config, :n],
+                        callback_every,
+                    )
+                    if callback(config, n, metrics):
+                        stopped[config] = True
+
+    # Informar también los episodios de la última ventana incompleta de cada configuración
+    if callback:
+        for config in configs[(episode_counts % callback_every != 0) & ~stopped]:
+            n = episode_counts[config]
+            metrics = rolling_metrics(
+                total_rewards[config, :n],
+                steps_per_episode[config, :n],
+                success_per_episode[config, :n],
+                n % callback_every,
+            )
+            callback(config, n, metrics)
+
+    # Calcular la recompensa promedio de los últimos 100 episodios jugados por cada configuración
+    avg_rewards = np.array(
+        [np.mean(total_rewards[config, max(0, n - 100):n], dtype=np.float64) for config, n in enumerate(episode_counts)]
+    )
+
+    if graficar_aprendizaje:
+        return avg_rewards, q_tables, total_rewards, steps_per_episode, success_per_episode
+    else:
+        return avg_rewards, q_tables
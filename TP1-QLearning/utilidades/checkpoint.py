@@ -0,0 +1,64 @@
+import os
+import pickle
+import numpy as np
+from utilidades.generales import save_atomic
+
+CHECKPOINT_STATE_FILENAME = "checkpoint.pkl"
+WORKING_Q_TABLE_FILENAME = "q_table.npy"
+
+
+def open_q_table(checkpoint_dir, shape, dtype=np.float64):
+    """Crea la Q-table de trabajo como un arreglo mapeado en memoria dentro de checkpoint_dir.
+
+    La tabla vive en disco (np.memmap), por lo que puede ser más grande que la RAM
+    disponible; el sistema operativo mantiene en memoria solo las partes en uso.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    return np.lib.format.open_memmap(
+        os.path.join(checkpoint_dir, WORKING_Q_TABLE_FILENAME),
+        mode="w+",
+        dtype=dtype,
+        shape=shape,
+    )
+
+
+def save_checkpoint(checkpoint_dir, q_table, state):
+    """Guarda una copia de la Q-table y el estado del entrenamiento.
+
+    La copia de la Q-table se escribe en un archivo con el número de episodio y el
+    estado (un diccionario con episodio, epsilon, estados de los generadores
+    aleatorios y métricas) apunta a ese archivo. Ambos se escriben de forma atómica y
+    el estado se reemplaza al final, así un proceso interrumpido en cualquier momento
+    deja siempre un checkpoint completo y consistente.
+    """
+    q_table_filename = f"q_table_ep{state['episode']:07}.npy"
+    save_atomic(os.path.join(checkpoint_dir, q_table_filename), q_table)
+
+    previous = None
+    state_path = os.path.join(checkpoint_dir, CHECKPOINT_STATE_FILENAME)
+    if os.path.exists(state_path):
+        previous = load_checkpoint_state(checkpoint_dir)["q_table_filename"]
+
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        pickle.dump(dict(state, q_table_filename=q_table_filename), file)
+    os.replace(tmp_path, state_path)
+
+    # La copia anterior ya no es necesaria
+    if previous and previous != q_table_filename:
+        os.remove(os.path.join(checkpoint_dir, previous))
+
+
+def load_checkpoint_state(checkpoint_dir):
+    """Lee el estado del último checkpoint guardado en checkpoint_dir."""
+    with open(os.path.join(checkpoint_dir, CHECKPOINT_STATE_FILENAME), "rb") as file:
+        return pickle.load(file)
+
+
+def load_checkpoint(checkpoint_dir):
+    """Devuelve (q_table, estado) del último checkpoint; la Q-table se abre con mmap_mode="r"."""
+    state = load_checkpoint_state(checkpoint_dir)
+    q_table = np.load(
+        os.path.join(checkpoint_dir, state["q_table_filename"]), mmap_mode="r"
+    )
+    return q_table, state
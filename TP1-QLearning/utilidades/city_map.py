@@ -0,0 +1,126 @@
+import numpy as np
+
+# Acción que coincide con cada sentido de circulación (0: abajo, 1: arriba, 2: derecha, 3: izquierda)
+STREET_DIRECTION_ACTIONS = {"down": 0, "up": 1, "right": 2, "left": 3}
+
+
+def city_blocks_grid(grid_size):
+    """Grilla booleana con las manzanas de la ciudad (todo lo que no es calle)."""
+    rows, cols = np.indices((grid_size, grid_size))
+    return (rows % 3 != 0) & (cols % 3 != 0)
+
+
+def street_direction_grid(grid_size):
+    """Grilla int8 con el sentido de cada calle como la acción que lo respeta (-1: sin sentido).
+
+    Sigue las mismas reglas que TaxiEnvCustom.get_street_direction: las calles
+    horizontales (fila múltiplo de 3) alternan derecha/izquierda y las verticales
+    (columna múltiplo de 3) alternan arriba/abajo; las intersecciones no tienen sentido.
+    """
+    rows, cols = np.indices((grid_size, grid_size))
+    directions = np.full((grid_size, grid_size), -1, dtype=np.int8)
+
+    horizontal = (rows % 3 == 0) & (cols % 3 != 0)
+    directions[horizontal & ((rows // 3) % 2 == 0)] = STREET_DIRECTION_ACTIONS["right"]
+    directions[horizontal & ((rows // 3) % 2 == 1)] = STREET_DIRECTION_ACTIONS["left"]
+
+    vertical = (cols % 3 == 0) & (rows % 3 != 0)
+    directions[vertical & ((cols // 3) % 2 == 0)] = STREET_DIRECTION_ACTIONS["up"]
+    directions[vertical & ((cols // 3) % 2 == 1)] = STREET_DIRECTION_ACTIONS["down"]
+    return directions
+
+
+def positions_to_grid(positions, grid_size):
+    """Convierte una lista de posiciones (fila, columna) en una grilla booleana.
+
+    Si positions ya es una grilla booleana se devuelve tal cual.
+    """
+    positions = np.asarray(positions)
+    if positions.dtype == bool and positions.shape == (grid_size, grid_size):
+        return positions
+    grid = np.zeros((grid_size, grid_size), dtype=bool)
+    if positions.size:
+        grid[positions[:, 0], positions[:, 1]] = True
+    return grid
+
+
+class CityMap:
+    """Mapa de la ciudad guardado en grillas de NumPy.
+
+    Contiene los obstáculos, los puntos de recogida (con su índice) y de entrega, y el
+    sentido de circulación de cada celda. Además implementa la dinámica del taxi de
+    forma vectorizada, de modo que se pueda aplicar a muchos estados a la vez.
+    """
+
+    def __init__(self, grid_size, pickups, dropoffs, obstacles):
+        self.grid_size = grid_size
+        self.obstacle_grid = positions_to_grid(obstacles, grid_size)
+        self.pickup_grid = positions_to_grid(pickups, grid_size)
+        self.dropoff_grid = positions_to_grid(dropoffs, grid_size)
+        self.street_grid = street_direction_grid(grid_size)
+        self.pickup_rows = np.array([r for r, _ in pickups])
+        self.pickup_cols = np.array([c for _, c in pickups])
+
+        # Celdas libres donde puede empezar un episodio
+        self.valid_rows, self.valid_cols = np.nonzero(
+            ~(self.obstacle_grid | self.pickup_grid | self.dropoff_grid)
+        )
+
+    def obstacle_positions(self):
+        """Lista de posiciones (fila, columna) de los obstáculos, en orden por filas."""
+        return [tuple(pos) for pos in np.argwhere(self.obstacle_grid).tolist()]
+
+    def valid_positions(self):
+        """Lista de posiciones (fila, columna) libres, en orden por filas."""
+        return list(zip(self.valid_rows.tolist(), self.valid_cols.tolist()))
+
+    def transition(self, rows, cols, passenger_idx, in_taxi, actions):
+        """Aplica la dinámica del taxi a arreglos de estados y acciones.
+
+        Es la versión vectorizada de TaxiEnvCustom._transition y devuelve
+        (filas, columnas, in_taxi, recompensas, dones).
+        """
+        # Posición luego de realizar la acción (sin salir de la grilla)
+        next_rows = (
+            rows
+            + ((actions == 0) & (rows < self.grid_size - 1))
+            - ((actions == 1) & (rows > 0))
+        )
+        next_cols = (
+            cols
+            + ((actions == 2) & (cols < self.grid_size - 1))
+            - ((actions == 3) & (cols > 0))
+        )
+
+        # Penalizar la circulación en contramano, salvo desde un pickup o dropoff
+        en_pickup_o_dropoff = self.pickup_grid[rows, cols] | self.dropoff_grid[rows, cols]
+        direction = self.street_grid[next_rows, next_cols]
+        contramano = (
+            (direction >= 0) & (actions < 4) & (direction != actions) & ~en_pickup_o_dropoff
+        )
+        rewards = -1 - 5 * contramano
+
+        # Realizar el movimiento si no hay obstáculos
+        libre = ~self.obstacle_grid[next_rows, next_cols]
+        rows = np.where(libre, next_rows, rows)
+        cols = np.where(libre, next_cols, cols)
+
+        # Penalizar si el taxi se mueve a una posición dropoff sin pasajero
+        rewards -= 5 * (self.dropoff_grid[rows, cols] & (in_taxi == 0))
+
+        # Levantar y dejar al pasajero
+        pickup = actions == 4
+        en_su_pickup = (
+            (in_taxi == 0)
+            & (rows == self.pickup_rows[passenger_idx])
+            & (cols == self.pickup_cols[passenger_idx])
+        )
+        rewards = np.where(pickup, np.where(en_su_pickup, 15, -15), rewards)
+
+        dropoff = actions == 5
+        en_dropoff = (in_taxi == 1) & self.dropoff_grid[rows, cols]
+        rewards = np.where(dropoff, np.where(en_dropoff, 30, -15), rewards)
+
+        dones = dropoff & en_dropoff
+        in_taxi = np.where(pickup & en_su_pickup, 1, np.where(dones, 0, in_taxi))
+        return rows, cols, in_taxi, rewards, dones
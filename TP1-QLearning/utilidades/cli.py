@@ -0,0 +1,158 @@
+"""Punto de entrada único del TP1: taxi-rl {train,evaluate,leaderboard,simulate,serve}.
+
+train, simulate y serve ejecutan train.py, test.py y serve_policy.py con los
+argumentos que siguen al subcomando (por ejemplo taxi-rl train --n-trials 20).
+evaluate evalúa una Q-table o una política ya guardada y leaderboard vuelve a
+rankear las Q-tables de todos los trials, sin importar las dependencias de
+entrenamiento ni de render.
+"""
+
+import argparse
+import os
+import runpy
+import sys
+
+base_dirpath = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # ./TP1-QLearning
+results_dirpath = os.path.join(base_dirpath, "results")  # ./TP1-QLearning/results
+
+SCRIPTS = {"train": "train.py", "simulate": "test.py", "serve": "serve_policy.py"}
+
+GRID_SIZE = 10
+PICKUP_LOCATIONS = [(1, 1), (8, 7), (4, 2), (2, 8)]
+DROPOFF_LOCATIONS = [(5, 5), (5, 4), (4, 5), (4, 4)]
+
+
+def run_script(script, args):
+    """Ejecuta un script del TP como si se lo llamara con python script args."""
+    script_path = os.path.join(base_dirpath, script)
+    sys.argv = [script_path] + args
+    if base_dirpath not in sys.path:
+        sys.path.insert(0, base_dirpath)
+    runpy.run_path(script_path, run_name="__main__")
+
+
+def make_env(compact_states=False):
+    """Entorno del TP (el mismo mapa que train.py)."""
+    from utilidades.taxi_env import TaxiEnvCustom, generate_city_blocks, remove_obstacles
+
+    obstacles = remove_obstacles(
+        generate_city_blocks(GRID_SIZE), PICKUP_LOCATIONS + DROPOFF_LOCATIONS
+    )
+    return TaxiEnvCustom(
+        GRID_SIZE,
+        PICKUP_LOCATIONS,
+        DROPOFF_LOCATIONS,
+        obstacles,
+        compiled=True,
+        compact_states=compact_states,
+    )
+
+
+def evaluate(args):
+    """Imprime la evaluación Monte Carlo y la exacta de una Q-table o política."""
+    from utilidades.evaluate import evaluate_q_table, evaluate_q_table_exact
+    from utilidades.generales import existing_q_table_path, load_q_table
+    from utilidades.policy import Policy
+
+    if args.policy:
+        policy = Policy.load(args.policy)
+        # El entorno debe numerar los estados igual que la política
+        env = make_env(policy.metadata.get("compact_states", False))
+        policy.check_env(env)
+        q_table = policy
+        # La evaluación exacta recorre la política como una Q-table one-hot
+        exact_q_table = (policy.actions[:, None] == range(env.action_space)).astype(float)
+    else:
+        env = make_env()
+        q_table = exact_q_table = load_q_table(existing_q_table_path(args.q_table), env)
+
+    score = evaluate_q_table(q_table, env, episodes=args.episodes, seed=args.seed)
+    print(f"Reward promedio ({args.episodes} episodios): {score}")
+    exact = evaluate_q_table_exact(exact_q_table, env)
+    print(
+        f"Evaluación exacta ({len(exact['starts'])} estados iniciales): "
+        f"reward promedio {exact['mean_reward']:.2f}, mínimo {exact['min_reward']:.2f}, "
+        f"tasa de éxito {exact['success_rate']:.2%}, ciclos {exact['loops'].sum()}"
+    )
+
+
+def leaderboard(args):
+    """Rankea las Q-tables de trial_q_tables.npy desde los mismos estados iniciales."""
+    from utilidades.evaluate import sample_start_states
+    from utilidades.leaderboard import (
+        evaluate_q_table_stack,
+        load_q_table_stack,
+        load_stack_index,
+        rank_trials,
+        write_leaderboard,
+    )
+
+    # El entorno debe numerar los estados igual que las Q-tables del stack
+    env = make_env(load_stack_index(args.stack)["compact_states"])
+    stack, trial_numbers = load_q_table_stack(args.stack)
+    starts = sample_start_states(env, episodes=args.episodes, seed=args.seed)
+    ranked = rank_trials(
+        trial_numbers, evaluate_q_table_stack(stack, env, starts, n_jobs=args.n_jobs)
+    )
+    write_leaderboard(ranked, args.output)
+    for position, result in enumerate(ranked[:10], start=1):
+        print(
+            f"{position:>3}. trial {result['trial']}: reward promedio "
+            f"{result['mean_reward']:.2f}, tasa de éxito {result['success_rate']:.2%}"
+        )
+    print(f"Ranking completo ({len(ranked)} trials) en: {args.output}")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    # Los argumentos de train, simulate y serve los interpreta el propio script
+    if argv and argv[0] in SCRIPTS:
+        run_script(SCRIPTS[argv[0]], argv[1:])
+        return
+
+    parser = argparse.ArgumentParser(prog="taxi-rl")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command, script in SCRIPTS.items():
+        subparsers.add_parser(command, help=f"Ejecuta {script} (los argumentos se le pasan tal cual)")
+
+    evaluate_parser = subparsers.add_parser(
+        "evaluate", help="Evalúa una Q-table o una política guardada"
+    )
+    evaluate_parser.add_argument(
+        "--q-table",
+        default=os.path.join(results_dirpath, "final_q_table.npz"),
+        help="Q-table a evaluar, .npy o .npz (por defecto results/final_q_table.npz, o .npy "
+        "si no existe)",
+    )
+    evaluate_parser.add_argument(
+        "--policy", default=None, help="Política exportada a evaluar en lugar de la Q-table"
+    )
+    evaluate_parser.add_argument("--episodes", type=int, default=100)
+    evaluate_parser.add_argument("--seed", type=int, default=None)
+
+    leaderboard_parser = subparsers.add_parser(
+        "leaderboard", help="Rankea las Q-tables de todos los trials en un benchmark fijo"
+    )
+    leaderboard_parser.add_argument(
+        "--stack",
+        default=os.path.join(results_dirpath, "trial_q_tables.npy"),
+        help="Q-tables de los trials (por defecto results/trial_q_tables.npy)",
+    )
+    leaderboard_parser.add_argument(
+        "--episodes", type=int, default=1000, help="Cantidad de estados iniciales del benchmark"
+    )
+    leaderboard_parser.add_argument("--seed", type=int, default=0)
+    leaderboard_parser.add_argument("--n-jobs", type=int, default=1)
+    leaderboard_parser.add_argument(
+        "--output", default=os.path.join(results_dirpath, "leaderboard.csv")
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "leaderboard":
+        leaderboard(args)
+    else:
+        evaluate(args)
+
+
+if __name__ == "__main__":
+    main()
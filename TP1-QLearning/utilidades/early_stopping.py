@@ -0,0 +1,102 @@
+class EarlyStopping:
+    """Criterios de convergencia para cortar q_learning antes de completar los episodios.
+
+    Se pasa como q_learning(..., early_stopping=EarlyStopping(...)) y cada criterio se
+    activa solo si se indica su parámetro; el entrenamiento se corta con el primero que
+    se cumpla (y nunca antes de min_episodes):
+
+    - delta_q_tol: el máximo |ΔQ| de cada actualización fue menor que delta_q_tol
+      durante delta_q_window episodios seguidos.
+    - policy_patience: la política greedy no cambió en ningún estado durante
+      policy_patience episodios seguidos.
+    - plateau_tol: la métrica de plateau_metric ("success" o "reward") promediada en
+      bloques de plateau_window episodios no mejoró más de plateau_tol respecto del
+      mejor bloque durante plateau_patience bloques seguidos.
+
+    Todos los criterios se actualizan una vez por episodio con contadores y sumas
+    parciales: q_learning informa el máximo |ΔQ| y la cantidad de cambios de la
+    política greedy del episodio, que calcula paso a paso sin recorrer la Q-table.
+    Al cortar, stopped_episode y reason indican el episodio y el criterio.
+    """
+
+    def __init__(
+        self,
+        delta_q_tol=None,
+        delta_q_window=100,
+        policy_patience=None,
+        plateau_tol=None,
+        plateau_window=100,
+        plateau_patience=3,
+        plateau_metric="success",
+        min_episodes=100,
+    ):
+        if plateau_metric not in ("success", "reward"):
+            raise ValueError("plateau_metric debe ser 'success' o 'reward'")
+        self.delta_q_tol = delta_q_tol
+        self.delta_q_window = delta_q_window
+        self.policy_patience = policy_patience
+        self.plateau_tol = plateau_tol
+        self.plateau_window = plateau_window
+        self.plateau_patience = plateau_patience
+        self.plateau_metric = plateau_metric
+        self.min_episodes = min_episodes
+        self.reset()
+
+    @property
+    def tracks_delta_q(self):
+        return self.delta_q_tol is not None
+
+    @property
+    def tracks_policy(self):
+        return self.policy_patience is not None
+
+    def reset(self):
+        """Reinicia los contadores (por ejemplo, para reutilizar el objeto en otro entrenamiento)."""
+        self.stopped_episode = None
+        self.reason = None
+        self.small_delta_episodes = 0
+        self.stable_policy_episodes = 0
+        self.block_sum = 0.0
+        self.block_episodes = 0
+        self.best_block_mean = None
+        self.plateau_blocks = 0
+
+    def update(self, episode, max_delta_q=None, policy_changes=None, reward=0.0, success=0):
+        """Registra un episodio terminado (episode empieza en 1); devuelve True si hay que cortar."""
+        reasons = []
+
+        if self.tracks_delta_q:
+            self.small_delta_episodes = (
+                self.small_delta_episodes + 1 if max_delta_q < self.delta_q_tol else 0
+            )
+            if self.small_delta_episodes >= self.delta_q_window:
+                reasons.append("delta_q")
+
+        if self.tracks_policy:
+            self.stable_policy_episodes = (
+                self.stable_policy_episodes + 1 if policy_changes == 0 else 0
+            )
+            if self.stable_policy_episodes >= self.policy_patience:
+                reasons.append("policy")
+
+        if self.plateau_tol is not None:
+            self.block_sum += success if self.plateau_metric == "success" else reward
+            self.block_episodes += 1
+            if self.block_episodes == self.plateau_window:
+                block_mean = self.block_sum / self.plateau_window
+                if self.best_block_mean is not None and block_mean < self.best_block_mean + self.plateau_tol:
+                    self.plateau_blocks += 1
+                else:
+                    self.plateau_blocks = 0
+                if self.best_block_mean is None or block_mean > self.best_block_mean:
+                    self.best_block_mean = block_mean
+                self.block_sum = 0.0
+                self.block_episodes = 0
+                if self.plateau_blocks >= self.plateau_patience:
+                    reasons.append("plateau")
+
+        if reasons and episode >= self.min_episodes:
+            self.stopped_episode = episode
+            self.reason = reasons[0]
+            return True
+        return False
@@ -1,15 +1,34 @@
 import numpy as np
 import time
+from utilidades.policy import Policy
 
-def evaluate_q_table(q_table, env, episodes=100, max_steps=200, render=False):
+def evaluate_q_table(q_table, env, episodes=100, max_steps=200, render=False, seed=None, rng=None):
+    """Recompensa promedio de la política greedy en episodios con inicio aleatorio.
+
+    q_table puede ser también una Policy. La acción greedy de cada estado se calcula
+    una sola vez antes de simular.
+
+    Con seed (o un numpy.random.Generator en rng) se reinicia el generador del entorno,
+    así distintas Q-tables se evalúan sobre los mismos estados iniciales.
+    """
+    if isinstance(q_table, Policy):
+        policy = np.asarray(q_table.actions).tolist()
+    else:
+        policy = np.argmax(q_table, axis=1).tolist()
     total_rewards = []
+    env_seed = None
+    if rng is not None:
+        env_seed = int(rng.integers(2**63))
+    elif seed is not None:
+        env_seed = seed
 
     for _ in range(episodes):
-        state = env.reset()
+        state = env.reset(seed=env_seed)
+        env_seed = None
         episode_reward = 0
 
         for _ in range(max_steps):
-            action = np.argmax(q_table[state])  # Elegir mejor acción
+            action = policy[state]  # Elegir mejor acción
             state, reward, done, _ = env.step(action)
             episode_reward += reward
 
@@ -23,4 +42,123 @@ def evaluate_q_table(q_table, env, episodes=100, max_steps=200, render=False):
         total_rewards.append(episode_reward)
 
     avg_reward = np.mean(total_rewards)
-    return avg_reward
\ No newline at end of file
+    return avg_reward
+
+def sample_start_states(env, episodes=100, seed=None):
+    """Estados iniciales de episodes reinicios del entorno con la semilla dada.
+
+    Son los mismos estados iniciales que usa evaluate_q_table con esa semilla, así se
+    pueden evaluar muchas Q-tables sobre un benchmark fijo sin volver a sortearlos.
+    """
+    starts = [env.reset(seed=seed)]
+    starts += [env.reset() for _ in range(episodes - 1)]
+    return np.array(starts)
+
+def evaluate_q_table_exact(q_table, env, max_steps=200, starts=None):
+    """Evalúa la política greedy de forma exacta sobre todos los estados iniciales posibles.
+
+    Como el entorno es determinista una vez fijada la posición inicial del taxi y el
+    pasajero, se recorren todas las combinaciones (valid_positions x pickups) en un
+    único lote vectorizado usando las tablas precalculadas del entorno. Un episodio
+    que vuelve a un estado ya visitado quedó en un ciclo: se corta en ese momento y la
+    recompensa hasta max_steps se calcula repitiendo el ciclo, sin simularlo.
+
+    Los ciclos se detectan con el algoritmo de Brent: por episodio solo se guarda un
+    estado (que se renueva cuando los pasos desde que se guardó llegan a una potencia de
+    dos), así la memoria es O(episodios) y no O(episodios * state_space). Un ciclo se
+    detecta a más tardar unos 2 * (inicio + largo del ciclo) pasos después de empezar; si
+    eso ocurre después de max_steps el episodio se simula hasta el final, con la misma
+    recompensa, pero no queda marcado en loops.
+
+    starts permite evaluar solo algunos estados iniciales (por ejemplo los de
+    sample_start_states, que pueden repetirse) en lugar de todas las combinaciones.
+    """
+    if not env.compiled:
+        env.compile()
+
+    # Transición de cada estado bajo la política greedy
+    all_states = np.arange(env.state_space)
+    policy = np.argmax(q_table, axis=1)
+    policy_next_states = env.next_state_table[all_states, policy]
+    policy_rewards = env.reward_table[all_states, policy]
+    policy_dones = env.done_table[all_states, policy]
+
+    if starts is None:
+        starts = np.array(
+            [
+                env.encode(row, col, passenger_idx, 0)
+                for row, col in env.valid_positions
+                for passenger_idx in range(len(env.pickups))
+            ]
+        )
+    starts = np.asarray(starts)
+    n = len(starts)
+    starts_idx = np.arange(n)
+
+    states = starts.copy()
+    # Brent: estado guardado de cada episodio, paso en que se guardó y distancia hasta renovarlo
+    saved_states = starts.copy()
+    saved_steps = np.zeros(n, dtype=np.int64)
+    save_every = np.ones(n, dtype=np.int64)
+    cumulative_rewards = np.zeros((n, max_steps + 1))
+    total_rewards = np.zeros(n)
+    steps = np.full(n, max_steps)
+    success = np.zeros(n, dtype=bool)
+    loops = np.zeros(n, dtype=bool)
+    active = np.ones(n, dtype=bool)
+
+    for t in range(max_steps):
+        idx = starts_idx[active]
+        if not len(idx):
+            break
+        current = states[idx]
+
+        # Detección de ciclos: se volvió al estado guardado
+        in_cycle = (current == saved_states[idx]) & (saved_steps[idx] < t)
+        if in_cycle.any():
+            cyc_idx, t0 = idx[in_cycle], saved_steps[idx[in_cycle]]
+            cycle_length = t - t0
+            cycle_reward = cumulative_rewards[cyc_idx, t] - cumulative_rewards[cyc_idx, t0]
+            remaining = max_steps - t
+            partial = (
+                cumulative_rewards[cyc_idx, t0 + remaining % cycle_length]
+                - cumulative_rewards[cyc_idx, t0]
+            )
+            total_rewards[cyc_idx] = (
+                cumulative_rewards[cyc_idx, t]
+                + (remaining // cycle_length) * cycle_reward
+                + partial
+            )
+            loops[cyc_idx] = True
+            active[cyc_idx] = False
+            idx, current = idx[~in_cycle], current[~in_cycle]
+
+        # Renovar el estado guardado cada potencia de dos pasos
+        renew = idx[t - saved_steps[idx] == save_every[idx]]
+        saved_states[renew] = states[renew]
+        saved_steps[renew] = t
+        save_every[renew] *= 2
+
+        # Avanzar un paso los episodios que siguen activos
+        cumulative_rewards[idx, t + 1] = cumulative_rewards[idx, t] + policy_rewards[current]
+        states[idx] = policy_next_states[current]
+
+        finished = idx[policy_dones[current]]
+        success[finished] = True
+        steps[finished] = t + 1
+        total_rewards[finished] = cumulative_rewards[finished, t + 1]
+        active[finished] = False
+
+    # Episodios truncados en max_steps sin terminar ni entrar en un ciclo
+    total_rewards[active] = cumulative_rewards[active, max_steps]
+
+    return {
+        "mean_reward": float(np.mean(total_rewards)),
+        "min_reward": float(np.min(total_rewards)),
+        "success_rate": float(np.mean(success)),
+        "starts": starts,
+        "rewards": total_rewards,
+        "steps": steps,
+        "success": success,
+        "loops": loops,
+    }
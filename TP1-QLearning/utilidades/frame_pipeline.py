@@ -0,0 +1,97 @@
+import os
+import queue
+import threading
+from utilidades.graficar import generar_video
+
+# Marca de fin de la cola de cuadros (se compara por identidad, nunca con ==)
+_STOP = object()
+
+
+def _iter_queue(frame_queue):
+    """Itera los elementos de la cola hasta encontrar la marca de fin."""
+    while True:
+        item = frame_queue.get()
+        if item is _STOP:
+            frame_queue.finished = True
+            return
+        yield item
+
+
+class FramePipeline:
+    """Guarda los cuadros de una simulación en hilos de fondo.
+
+    El bucle de simulación solo encola cada cuadro (un arreglo RGB) con put(); hilos
+    trabajadores escriben los PNG de cada paso en save_step_path y un hilo aparte
+    codifica el GIF/MP4 en video_path, en orden. Las colas son acotadas (max_queue
+    cuadros), así la simulación nunca se adelanta demasiado a la escritura y la
+    memoria usada no crece. La compresión de PNG y de GIF libera el GIL, por lo que se
+    solapa con la simulación y el render.
+
+    Se usa como context manager: al salir se espera a que se escriban todos los
+    cuadros y se relanza el primer error de los trabajadores, si lo hubo.
+    """
+
+    def __init__(self, save_step_path=None, video_path=None, fps=5, max_queue=32, png_workers=2):
+        self.save_step_path = save_step_path
+        self.video_path = video_path
+        self.fps = fps
+        self.errors = []
+        self.threads = []
+
+        # Cada trabajador de PNG tiene su cola y los pasos se reparten por turnos
+        self.png_queues = []
+        if save_step_path:
+            self.png_queues = [queue.Queue(max_queue) for _ in range(png_workers)]
+            for png_queue in self.png_queues:
+                self._start(png_queue, self._save_pngs)
+        self.video_queue = None
+        if video_path:
+            self.video_queue = queue.Queue(max_queue)
+            self._start(self.video_queue, self._encode_video)
+
+    def put(self, num, frame):
+        """Encola el cuadro del paso num; se bloquea si los trabajadores van atrasados."""
+        if self.png_queues:
+            self.png_queues[num % len(self.png_queues)].put((num, frame))
+        if self.video_queue is not None:
+            self.video_queue.put(frame)
+
+    def close(self):
+        """Espera a que se escriban todos los cuadros encolados."""
+        for frame_queue in self.png_queues + [self.video_queue]:
+            if frame_queue is not None:
+                frame_queue.put(_STOP)
+        for thread in self.threads:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _start(self, frame_queue, work):
+        thread = threading.Thread(target=self._run, args=(frame_queue, work), daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def _run(self, frame_queue, work):
+        """Ejecuta un trabajador; si falla, sigue vaciando su cola para no bloquear put()."""
+        try:
+            work(frame_queue)
+        except Exception as error:
+            self.errors.append(error)
+            if not getattr(frame_queue, "finished", False):
+                for _ in _iter_queue(frame_queue):
+                    pass
+
+    def _save_pngs(self, frame_queue):
+        import imageio
+
+        for num, frame in _iter_queue(frame_queue):
+            imageio.imwrite(os.path.join(self.save_step_path, f"step_{num:02}.png"), frame)
+
+    def _encode_video(self, frame_queue):
+        generar_video(None, self.video_path, fps=self.fps, frames=_iter_queue(frame_queue))
@@ -1,4 +1,6 @@
 import os
+import tempfile
+import numpy as np
 
 def clear_or_create_folder(folder_path):
     # Crear la ruta si no existe
@@ -12,4 +14,81 @@ def clear_or_create_folder(folder_path):
             elif os.path.isdir(file_path):
                 os.rmdir(file_path)
         except Exception as e:
-            print(f"Failed to delete {file_path}. Reason: {e}")
\ No newline at end of file
+            print(f"Failed to delete {file_path}. Reason: {e}")
+
+def save_atomic(file_path, array):
+    """Guarda un arreglo en formato .npy de forma atómica.
+
+    Se escribe primero un archivo temporal en la misma carpeta y luego se reemplaza
+    el destino, para que otro proceso nunca lea un archivo a medio escribir.
+    """
+    _write_atomic(file_path, lambda file: np.save(file, array))
+
+
+def _write_atomic(file_path, write):
+    """Llama a write(archivo) sobre un temporal de la misma carpeta y luego lo renombra a file_path."""
+    folder_path = os.path.dirname(file_path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=folder_path, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            write(file)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def save_q_table(file_path, q_table, env=None, dtype=None):
+    """Guarda una Q-table en formato .npz junto con su mapa de estados.
+
+    dtype permite reducir la precisión al guardar (por ejemplo np.float16). Si el
+    entorno usa estados compactos se guarda state_index (el índice completo de cada
+    fila) para poder reconstruir la tabla en otro entorno. Se escribe de forma atómica,
+    como save_atomic.
+    """
+    data = {"q_table": q_table if dtype is None else q_table.astype(dtype)}
+    if env is not None:
+        data["full_state_space"] = env.state_index.full_state_space
+        if env.state_index.compact:
+            data["state_index"] = env.state_index.to_full
+    _write_atomic(file_path, lambda file: np.savez(file, **data))
+
+
+def existing_q_table_path(file_path):
+    """Devuelve file_path o, si no existe, la misma ruta con la otra extensión (.npz o .npy).
+
+    Así los valores por defecto (final_q_table.npz) siguen funcionando con las tablas
+    .npy de ejecuciones anteriores. Si no existe ninguna se devuelve file_path.
+    """
+    if os.path.exists(file_path):
+        return file_path
+    root, extension = os.path.splitext(file_path)
+    alternative = root + (".npy" if extension == ".npz" else ".npz")
+    return alternative if os.path.exists(alternative) else file_path
+
+
+def load_q_table(file_path, env=None):
+    """Carga una Q-table guardada con np.save (.npy) o con save_q_table (.npz).
+
+    Si se pasa el entorno, la tabla se traduce a su numeración de estados: una tabla
+    compacta se expande a un entorno completo (los estados inalcanzables quedan en
+    cero) y viceversa. La tabla se devuelve siempre en float64.
+    """
+    if not file_path.endswith(".npz"):
+        return np.load(file_path)
+
+    with np.load(file_path) as data:
+        q_table = data["q_table"].astype(np.float64)
+        if env is None:
+            return q_table
+        state_index = data["state_index"] if "state_index" in data else None
+        full_state_space = int(data["full_state_space"])
+
+    if state_index is not None:
+        full_q_table = np.zeros((full_state_space, q_table.shape[1]))
+        full_q_table[state_index] = q_table
+        q_table = full_q_table
+
+    if env.state_index.compact:
+        q_table = q_table[env.state_index.to_full]
+    return q_table
@@ -1,97 +1,224 @@
-import matplotlib.pyplot as plt
 import numpy as np
 import os
-import imageio
-
-
-def generar_video(im_folder, output_path, fps=1):
-    images = []
-    filenames = sorted([f for f in os.listdir(im_folder) if f.endswith(".png")])
-    for filename in filenames:
-        img_path = os.path.join(im_folder, filename)
-        images.append(imageio.imread(img_path))
-    imageio.mimsave(output_path, images, fps=fps)
-
-
-def plot_learning_curve(rewards, steps=None, success=None, window=100, save_path=None):
-    if rewards:
-        plt.figure(figsize=(10, 5))
-        plt.plot(rewards, label="Reward por episodio", color="tab:blue")
-        if len(rewards) >= window:
-            rolling_avg = np.convolve(rewards, np.ones(window) / window, mode="valid")
-            plt.plot(
-                range(window - 1, len(rewards)),
-                rolling_avg,
-                label=f"Reward media móvil ({window})",
-                color="tab:cyan",
-            )
-        plt.xlabel("Episodio")
-        plt.ylabel("Recompensa")
-        plt.title("Evolución de la Recompensa")
-        plt.legend()
-        plt.grid(True)
-        if save_path:
-            plt.savefig(save_path.replace(".png", "_reward.png"))
-            plt.close()
-        else:
-            plt.show()
-
-    if steps:
-        plt.figure(figsize=(10, 5))
-        plt.plot(steps, label="Pasos por episodio", color="tab:red", alpha=0.5)
-        if len(steps) >= window:
-            rolling_steps = np.convolve(steps, np.ones(window) / window, mode="valid")
-            plt.plot(
-                range(window - 1, len(steps)),
-                rolling_steps,
-                label=f"Pasos media móvil ({window})",
-                color="tab:orange",
-            )
-        plt.xlabel("Episodio")
-        plt.ylabel("Pasos")
-        plt.title("Evolución de los Pasos por Episodio")
-        plt.legend()
-        plt.grid(True)
-        if save_path:
-            plt.savefig(save_path.replace(".png", "_steps.png"))
-            plt.close()
-        else:
-            plt.show()
-
-    if success:
-        plt.figure(figsize=(10, 5))
-        if len(success) >= window:
-            rolling_success = np.convolve(
-                success, np.ones(window) / window, mode="valid"
-            )
-            plt.plot(
-                range(window - 1, len(success)),
-                rolling_success,
-                label=f"Tasa de éxito ({window})",
-                color="tab:green",
-                linestyle="--",
+from concurrent.futures import ProcessPoolExecutor
+
+# matplotlib e imageio se importan dentro de cada función: son lentos de importar y
+# solo se necesitan al graficar o generar el video
+
+
+def generar_video(im_folder, output_path, fps=1, frames=None):
+    """Genera un GIF/MP4 con los cuadros de la simulación.
+
+    Los cuadros se escriben de a uno con un writer de imageio, sin acumularlos en una
+    lista. Si se pasa frames (cualquier iterable o generador de arreglos RGB) se usan
+    esos cuadros directamente; si no, se leen los PNG de im_folder en orden.
+    """
+    import imageio
+
+    if frames is None:
+        filenames = sorted([f for f in os.listdir(im_folder) if f.endswith(".png")])
+        frames = (
+            imageio.imread(os.path.join(im_folder, filename)) for filename in filenames
+        )
+
+    with imageio.get_writer(output_path, fps=fps) as writer:
+        for frame in frames:
+            writer.append_data(frame)
+
+
+def rolling_stats(values, window, max_points=2000, percentiles=(10, 90)):
+    """Media móvil y bandas de percentiles de values, listas para graficar.
+
+    La media móvil se calcula para todos los episodios con una suma acumulada (O(n),
+    sin importar window); los percentiles de cada ventana solo se calculan en los
+    (a lo sumo) max_points episodios que se grafican. Devuelve un diccionario con
+    "x" (episodio en que termina cada ventana), "mean" y "bands" (lista de pares
+    (percentil inferior, percentil superior)), o None si hay menos de window valores.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < window:
+        return None
+    cumsum = np.concatenate(([0.0], np.cumsum(values)))
+    rolling_mean = (cumsum[window:] - cumsum[:-window]) / window
+
+    x = np.unique(np.linspace(0, len(rolling_mean) - 1, min(max_points, len(rolling_mean))).astype(np.int64))
+    stats = {"x": x + window - 1, "mean": rolling_mean[x], "bands": []}
+    if percentiles:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window)[x]
+        low_high = np.percentile(windows, sorted(percentiles), axis=1)
+        lows, highs = low_high[: len(percentiles) // 2], low_high[::-1][: len(percentiles) // 2]
+        stats["bands"] = list(zip(lows, highs))
+    return stats
+
+
+def downsample_minmax(values, max_points=2000):
+    """Reduce values a unos max_points puntos conservando el mínimo y el máximo de cada tramo.
+
+    Devuelve (x, y): los índices originales y sus valores, en orden. A diferencia de
+    tomar uno de cada k puntos, los picos (por ejemplo un episodio con -200) siguen
+    apareciendo en el gráfico.
+    """
+    values = np.asarray(values)
+    n_buckets = max_points // 2
+    if len(values) <= max_points or n_buckets == 0:
+        return np.arange(len(values)), values
+    bucket_size = int(np.ceil(len(values) / n_buckets))
+    n_full = len(values) // bucket_size
+    buckets = values[: n_full * bucket_size].reshape(n_full, bucket_size)
+    offsets = np.arange(n_full) * bucket_size
+    x = np.stack([offsets + buckets.argmin(axis=1), offsets + buckets.argmax(axis=1)], axis=1)
+    x.sort(axis=1)
+    x = x.ravel()
+    if n_full * bucket_size < len(values):
+        rest = values[n_full * bucket_size :]
+        extra = n_full * bucket_size + np.array(sorted({int(rest.argmin()), int(rest.argmax())}))
+        x = np.concatenate([x, extra])
+    return x, values[x]
+
+
+class BackgroundPlotter:
+    """Grafica en un proceso aparte para que el entrenamiento no espere a matplotlib.
+
+    plot_learning_curve y plot_study_results reciben plotter=BackgroundPlotter():
+    los datos se reducen en el proceso principal y solo se envían los puntos a
+    graficar. close() (o salir del with) espera a que se guarden todas las figuras y
+    relanza el primer error.
+    """
+
+    def __init__(self):
+        self.executor = ProcessPoolExecutor(max_workers=1, initializer=_use_file_backend)
+        self.futures = []
+
+    def submit(self, function, *args, **kwargs):
+        self.futures.append(self.executor.submit(function, *args, **kwargs))
+
+    def close(self):
+        try:
+            for future in self.futures:
+                future.result()
+        finally:
+            self.futures = []
+            self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _use_file_backend():
+    import matplotlib
+
+    matplotlib.use("Agg")  # El proceso de fondo solo guarda archivos
+
+
+def _run(plotter, function, *args):
+    if plotter is None:
+        function(*args)
+    else:
+        plotter.submit(function, *args)
+
+
+def plot_learning_curve(rewards, steps=None, success=None, window=100, save_path=None, max_points=2000, percentiles=(10, 90), plotter=None):
+    """Grafica recompensa, pasos y tasa de éxito por episodio.
+
+    Los valores por episodio se reducen con downsample_minmax y las medias móviles y
+    bandas de percentiles se calculan una sola vez con rolling_stats, así las figuras
+    tienen a lo sumo unos max_points puntos por serie aunque el entrenamiento tenga
+    millones de episodios. Con plotter (un BackgroundPlotter) las figuras se dibujan
+    y guardan en segundo plano.
+    """
+    series = [
+        ("reward", rewards, "Reward", "Recompensa", "Evolución de la Recompensa", "tab:blue", "tab:cyan"),
+        ("steps", steps, "Pasos", "Pasos", "Evolución de los Pasos por Episodio", "tab:red", "tab:orange"),
+    ]
+    for name, values, label, ylabel, title, raw_color, mean_color in series:
+        if values is None or not len(values):
+            continue
+        raw = downsample_minmax(values, max_points)
+        stats = rolling_stats(values, window, max_points, percentiles)
+        _run(
+            plotter,
+            _plot_series,
+            raw,
+            stats,
+            window,
+            (label, ylabel, title, raw_color, mean_color),
+            percentiles,
+            save_path and save_path.replace(".png", f"_{name}.png"),
+        )
+
+    if success is not None and len(success):
+        stats = rolling_stats(success, window, max_points, percentiles=None)
+        raw = None if stats else downsample_minmax(success, max_points)
+        _run(plotter, _plot_success, raw, stats, window, save_path and save_path.replace(".png", "_success.png"))
+
+
+def _plot_series(raw, stats, window, labels, percentiles, save_path):
+    import matplotlib.pyplot as plt
+
+    label, ylabel, title, raw_color, mean_color = labels
+    plt.figure(figsize=(10, 5))
+    plt.plot(*raw, label=f"{label} por episodio", color=raw_color, alpha=0.5, linewidth=0.8)
+    if stats is not None:
+        levels = sorted(percentiles or ())
+        for (low, high), p_low, p_high in zip(stats["bands"], levels, levels[::-1]):
+            plt.fill_between(
+                stats["x"], low, high, color=mean_color, alpha=0.25,
+                label=f"Percentiles {p_low:g}-{p_high:g} ({window})",
             )
-        else:
-            plt.plot(success, label="Tasa de éxito", color="tab:green", linestyle="--")
-        plt.xlabel("Episodio")
-        plt.ylabel("Tasa de éxito")
-        plt.title("Evolución de la Tasa de Éxito")
-        plt.legend()
-        plt.grid(True)
-        if save_path:
-            plt.savefig(save_path.replace(".png", "_success.png"))
-            plt.close()
-        else:
-            plt.show()
-
-
-def plot_study_results(study, save_dir):
-    trials = study.trials
-    trial_nums = [t.number for t in trials]
-    rewards = [t.value for t in trials]
-    alphas = [t.params["alpha"] for t in trials]
-    gammas = [t.params["gamma"] for t in trials]
-    epsilons = [t.params["epsilon"] for t in trials]
+        plt.plot(stats["x"], stats["mean"], label=f"{label} media móvil ({window})", color=mean_color)
+    plt.xlabel("Episodio")
+    plt.ylabel(ylabel)
+    plt.title(title)
+    plt.legend()
+    plt.grid(True)
+    _show_or_save(plt, save_path)
+
+
+def _plot_success(raw, stats, window, save_path):
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(10, 5))
+    if stats is not None:
+        plt.plot(stats["x"], stats["mean"], label=f"Tasa de éxito ({window})", color="tab:green", linestyle="--")
+    else:
+        plt.plot(*raw, label="Tasa de éxito", color="tab:green", linestyle="--")
+    plt.xlabel("Episodio")
+    plt.ylabel("Tasa de éxito")
+    plt.title("Evolución de la Tasa de Éxito")
+    plt.legend()
+    plt.grid(True)
+    _show_or_save(plt, save_path)
+
+
+def _show_or_save(plt, save_path):
+    if save_path:
+        plt.savefig(save_path)
+        plt.close()
+    else:
+        plt.show()
+
+
+def plot_study_results(study, save_dir, plotter=None):
+    """Gráficos de convergencia del estudio y de cada hiperparámetro contra la recompensa.
+
+    Los datos de los trials se extraen en el proceso principal (el estudio no se
+    envía al proceso de fondo cuando se usa plotter).
+    """
+    # Solo se grafican los trials completos (los podados quedan afuera)
+    trials = [t for t in study.trials if t.state.name == "COMPLETE"]
+    trial_nums = np.array([t.number for t in trials])
+    rewards = np.array([t.value for t in trials])
+    params = {
+        name: np.array([t.params[name] for t in trials]) for name in ("alpha", "gamma", "epsilon")
+    }
+    _run(plotter, _plot_study_data, trial_nums, rewards, params, save_dir)
+
+
+def _plot_study_data(trial_nums, rewards, params, save_dir):
+    import matplotlib.pyplot as plt
 
     # Gráfico de convergencia sin filtrar
     plt.figure(figsize=(10, 5))
@@ -104,10 +231,9 @@ def plot_study_results(study, save_dir):
     plt.close()
 
     # Gráfico de convergencia filtrando outliers negativos
-    trial_nums_filt = [n for n, r in zip(trial_nums, rewards) if r > -200]
-    rewards_filt = [r for r in rewards if r > -200]
+    keep = rewards > -200
     plt.figure(figsize=(10, 5))
-    plt.plot(trial_nums_filt, rewards_filt, marker="o", color="tab:blue")
+    plt.plot(trial_nums[keep], rewards[keep], marker="o", color="tab:blue")
     plt.xlabel("Trial")
     plt.ylabel("Recompensa promedio")
     plt.title("Convergencia (sin outliers extremos)")
@@ -115,24 +241,22 @@ def plot_study_results(study, save_dir):
     plt.savefig(os.path.join(save_dir, "optuna_convergencia_filtrada.png"))
     plt.close()
 
-    # Escala de color según número de trial (más oscuro = más reciente)
+    # Escala de color según número de trial (más oscuro = más reciente), calculada una sola vez
     cmap = plt.colormaps.get_cmap("viridis")
-    norm = plt.Normalize(min(trial_nums), max(trial_nums))
+    norm = plt.Normalize(trial_nums.min(), trial_nums.max())
+    colors = cmap(norm(trial_nums))
+    sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
+    sm.set_array([])
 
-    for param_name, param_values in zip(
-        ["alpha", "gamma", "epsilon"], [alphas, gammas, epsilons]
-    ):
+    for param_name, param_values in params.items():
         fig, ax = plt.subplots(figsize=(10, 5))
-        colors = [cmap(norm(n)) for n in trial_nums]
-        scatter = ax.scatter(param_values, rewards, c=colors, edgecolor="black")
+        ax.scatter(param_values, rewards, c=colors, edgecolor="black")
         ax.set_xlabel(param_name)
         ax.set_ylabel("Recompensa promedio")
         ax.set_title(f"Importancia de {param_name} (color según número de trial)")
         ax.grid(True)
 
         # Agregar barra de color correctamente asociada al eje
-        sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
-        sm.set_array([])
         cbar = fig.colorbar(sm, ax=ax)
         cbar.set_label("Número de Trial")
 
@@ -0,0 +1,165 @@
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from utilidades.evaluate import evaluate_q_table_exact
+from utilidades.generales import load_q_table
+
+LEADERBOARD_HEADER = [
+    "Ranking",
+    "Trial",
+    "Recompensa promedio",
+    "Recompensa mínima",
+    "Tasa de éxito",
+    "Pasos promedio",
+    "Ciclos",
+]
+
+
+def _index_path(stack_path):
+    return os.path.splitext(stack_path)[0] + ".json"
+
+
+def write_q_table_stack(q_table_paths, stack_path, compact_states=False):
+    """Junta las Q-tables de los trials en un único .npy de forma (trials, estados, acciones).
+
+    q_table_paths es un diccionario número de trial -> ruta de su Q-table (.npy o .npz
+    de save_q_table, todas con la misma numeración de estados). Las tablas se copian de
+    a una a un arreglo mapeado a disco, sin cargarlas todas en memoria, y los números de
+    trial de cada fila y si los estados son compactos se guardan en el .json del mismo
+    nombre. El archivo se escribe con otro nombre y se reemplaza al final, como en
+    save_atomic.
+    """
+    trial_numbers = sorted(q_table_paths)
+    first = load_q_table(q_table_paths[trial_numbers[0]])
+    tmp_path = stack_path + ".tmp.npy"
+    stack = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=first.dtype, shape=(len(trial_numbers),) + first.shape
+    )
+    for row, trial_number in enumerate(trial_numbers):
+        stack[row] = load_q_table(q_table_paths[trial_number])
+    stack.flush()
+    del stack
+    os.replace(tmp_path, stack_path)
+    with open(_index_path(stack_path), "w") as file:
+        json.dump({"trials": trial_numbers, "compact_states": bool(compact_states)}, file)
+
+
+def load_stack_index(stack_path):
+    """Índice de un stack: {"trials": [...], "compact_states": bool}."""
+    with open(_index_path(stack_path)) as file:
+        index = json.load(file)
+    index.setdefault("compact_states", False)
+    return index
+
+
+def load_q_table_stack(stack_path):
+    """Devuelve (stack, números de trial) de un archivo escrito con write_q_table_stack.
+
+    stack se abre con mmap_mode="r": stack[i] es la Q-table del trial trial_numbers[i].
+    """
+    stack = np.load(stack_path, mmap_mode="r")
+    return stack, load_stack_index(stack_path)["trials"]
+
+
+# Estado de cada proceso del pool: la vista sobre la memoria compartida, el entorno y el benchmark
+_worker = {}
+
+
+def _attach_worker(shm_name, shape, dtype, env, starts, max_steps):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker.update(
+        shm=shm,  # Se guarda para que la memoria siga mapeada mientras viva el proceso
+        stack=np.ndarray(shape, dtype=dtype, buffer=shm.buf),
+        env=env,
+        starts=starts,
+        max_steps=max_steps,
+    )
+
+
+def _evaluate_rows(rows):
+    return _evaluate_stack_rows(
+        _worker["stack"], rows, _worker["env"], _worker["starts"], _worker["max_steps"]
+    )
+
+
+def _evaluate_stack_rows(stack, rows, env, starts, max_steps):
+    results = []
+    for row in rows:
+        exact = evaluate_q_table_exact(stack[row], env, max_steps=max_steps, starts=starts)
+        results.append(
+            {
+                "mean_reward": exact["mean_reward"],
+                "min_reward": exact["min_reward"],
+                "success_rate": exact["success_rate"],
+                "mean_steps": float(np.mean(exact["steps"])),
+                "loops": int(exact["loops"].sum()),
+            }
+        )
+    return results
+
+
+def evaluate_q_table_stack(stack, env, starts, max_steps=200, n_jobs=1):
+    """Evalúa la política greedy de cada Q-table de stack desde los mismos estados iniciales.
+
+    Cada Q-table se evalúa con evaluate_q_table_exact sobre starts (por ejemplo los de
+    sample_start_states), por lo que todas se comparan en el mismo benchmark. Con
+    n_jobs > 1 el stack se copia una sola vez a un bloque de memoria compartida
+    (multiprocessing.shared_memory) que los procesos del pool leen directamente; a
+    cada tarea solo se le envían los índices de sus filas.
+
+    Devuelve una lista con un diccionario de métricas por fila de stack.
+    """
+    if not env.compiled:
+        env.compile()
+    starts = np.asarray(starts)
+    if n_jobs <= 1 or len(stack) <= 1:
+        return _evaluate_stack_rows(stack, range(len(stack)), env, starts, max_steps)
+
+    shm = shared_memory.SharedMemory(create=True, size=stack.nbytes)
+    try:
+        np.ndarray(stack.shape, dtype=stack.dtype, buffer=shm.buf)[:] = stack
+        chunks = np.array_split(np.arange(len(stack)), min(len(stack), n_jobs * 4))
+        with ProcessPoolExecutor(
+            max_workers=n_jobs,
+            initializer=_attach_worker,
+            initargs=(shm.name, stack.shape, stack.dtype, env, starts, max_steps),
+        ) as executor:
+            results = []
+            for chunk_results in executor.map(_evaluate_rows, chunks):
+                results.extend(chunk_results)
+        return results
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def rank_trials(trial_numbers, results):
+    """Ordena los resultados por recompensa promedio y, a igualdad, por tasa de éxito."""
+    ranked = sorted(
+        zip(trial_numbers, results),
+        key=lambda item: (item[1]["mean_reward"], item[1]["success_rate"]),
+        reverse=True,
+    )
+    return [dict(result, trial=trial_number) for trial_number, result in ranked]
+
+
+def write_leaderboard(ranked, csv_path):
+    """Escribe el ranking (la salida de rank_trials) en un CSV con LEADERBOARD_HEADER."""
+    with open(csv_path, mode="w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(LEADERBOARD_HEADER)
+        for position, result in enumerate(ranked, start=1):
+            writer.writerow(
+                [
+                    position,
+                    result["trial"],
+                    result["mean_reward"],
+                    result["min_reward"],
+                    result["success_rate"],
+                    result["mean_steps"],
+                    result["loops"],
+                ]
+            )
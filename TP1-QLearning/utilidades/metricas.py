@@ -0,0 +1,64 @@
+import csv
+import os
+
+
+class CSVMetricsSink:
+    """Callback de q_learning que agrega las métricas de cada episodio a un CSV.
+
+    Se usa como callback=CSVMetricsSink(ruta): cada callback_every episodios escribe
+    una fila por episodio (episodio, recompensa, pasos y éxito) y hace flush,
+    así se puede seguir un entrenamiento largo mientras corre. Con append=True se
+    continúa un archivo existente (por ejemplo al reanudar desde un checkpoint); si
+    además se indica truncate_after, antes se descartan las filas de los episodios
+    posteriores a ese (los que se jugaron después del checkpoint y se van a repetir),
+    y luego solo se escriben los episodios posteriores a la última fila conservada.
+    """
+
+    header = ["Episodio", "Recompensa", "Pasos", "Exito"]
+
+    def __init__(self, file_path, append=False, truncate_after=None):
+        self.file_path = file_path
+        self.last_episode = 0
+        if append and truncate_after is not None and os.path.exists(file_path):
+            self.last_episode = self._truncate(file_path, truncate_after)
+        self.file = open(file_path, mode="a" if append else "w", newline="")
+        self.writer = csv.writer(self.file)
+        if not append or self.file.tell() == 0:
+            self.writer.writerow(self.header)
+            self.file.flush()
+
+    @staticmethod
+    def _truncate(file_path, last_episode):
+        """Recorta el CSV justo después de la fila del episodio last_episode.
+
+        Devuelve el episodio de la última fila conservada (0 si no queda ninguna).
+        """
+        kept_episode = 0
+        with open(file_path, "rb+") as file:
+            file.readline()  # encabezado
+            offset = file.tell()
+            for line in iter(file.readline, b""):
+                if not line.strip() or int(line.split(b",", 1)[0]) > last_episode:
+                    break
+                kept_episode = int(line.split(b",", 1)[0])
+                offset = file.tell()
+            file.truncate(offset)
+        return kept_episode
+
+    def __call__(self, episode, metrics):
+        first_episode = episode - len(metrics["rewards"]) + 1
+        # Saltear los episodios que ya están en el archivo (p. ej. al reanudar)
+        skip = max(0, self.last_episode - first_episode + 1)
+        self.writer.writerows(
+            zip(
+                range(first_episode + skip, episode + 1),
+                metrics["rewards"][skip:].tolist(),
+                metrics["steps"][skip:].tolist(),
+                metrics["success"][skip:].tolist(),
+            )
+        )
+        self.last_episode = max(self.last_episode, episode)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,128 @@
+import numpy as np
+
+
+def _model_tables(env):
+    """Devuelve las tablas de transición, recompensa y finalización del entorno."""
+    if not env.compiled:
+        env.compile()
+    return env.next_state_table, env.reward_table, env.done_table
+
+
+def _q_from_values(values, next_state_table, reward_table, done_table, gamma):
+    """Calcula la Q-table a partir de los valores de estado (Q = R + γ·V(s') si no termina)."""
+    return reward_table + gamma * np.where(done_table, 0.0, values[next_state_table])
+
+
+def value_iteration(env, gamma=0.9, tol=1e-8, max_sweeps=10_000, in_place=False):
+    """Resuelve el MDP del taxi por iteración de valor.
+
+    Usa las tablas precalculadas del entorno (TaxiEnvCustom.compile), por lo que cada
+    barrido es una operación vectorizada sobre todo el espacio de estados. Con
+    in_place=True se hacen barridos Gauss-Seidel: cada estado usa los valores ya
+    actualizados en el mismo barrido.
+
+    Devuelve la Q-table óptima de forma (state_space, action_space) y la cantidad de
+    barridos realizados.
+    """
+    next_state_table, reward_table, done_table = _model_tables(env)
+    values = np.zeros(env.state_space)
+
+    if in_place:
+        # Los barridos Gauss-Seidel son secuenciales: se recorren listas de Python, que
+        # son mucho más rápidas que indexar arreglos de NumPy elemento a elemento
+        values = values.tolist()
+        transitions = [
+            list(zip(next_states, rewards, continues))
+            for next_states, rewards, continues in zip(
+                next_state_table.tolist(),
+                reward_table.tolist(),
+                (~done_table).tolist(),
+            )
+        ]
+
+    for sweep in range(1, max_sweeps + 1):
+        if in_place:
+            delta = 0.0
+            for state, state_transitions in enumerate(transitions):
+                new_value = max(
+                    reward + gamma * values[next_state] * continues
+                    for next_state, reward, continues in state_transitions
+                )
+                delta = max(delta, abs(new_value - values[state]))
+                values[state] = new_value
+        else:
+            q_table = _q_from_values(
+                values, next_state_table, reward_table, done_table, gamma
+            )
+            new_values = q_table.max(axis=1)
+            delta = np.max(np.abs(new_values - values))
+            values = new_values
+
+        if delta < tol:
+            break
+
+    values = np.asarray(values)
+    q_table = _q_from_values(values, next_state_table, reward_table, done_table, gamma)
+    return q_table, sweep
+
+
+def policy_evaluation(policy, env, gamma=0.9, tol=1e-8, max_sweeps=10_000, in_place=False):
+    """Calcula los valores de estado de una política determinista (una acción por estado)."""
+    next_state_table, reward_table, done_table = _model_tables(env)
+    states = np.arange(env.state_space)
+    next_states = next_state_table[states, policy]
+    rewards = reward_table[states, policy]
+    continues = ~done_table[states, policy]
+    values = np.zeros(env.state_space)
+
+    if in_place:
+        values = values.tolist()
+        transitions = list(
+            zip(next_states.tolist(), rewards.tolist(), continues.tolist())
+        )
+
+    for _ in range(max_sweeps):
+        if in_place:
+            delta = 0.0
+            for state, (next_state, reward, continue_) in enumerate(transitions):
+                new_value = reward + gamma * values[next_state] * continue_
+                delta = max(delta, abs(new_value - values[state]))
+                values[state] = new_value
+        else:
+            new_values = rewards + gamma * continues * values[next_states]
+            delta = np.max(np.abs(new_values - values))
+            values = new_values
+
+        if delta < tol:
+            break
+
+    return np.asarray(values)
+
+
+def policy_iteration(env, gamma=0.9, tol=1e-8, max_sweeps=10_000, max_iterations=1000, in_place=False):
+    """Resuelve el MDP del taxi por iteración de política.
+
+    Alterna la evaluación de la política actual (hasta tol o max_sweeps barridos) con
+    una mejora greedy, hasta que la política deja de cambiar.
+
+    Devuelve la Q-table de la política final de forma (state_space, action_space) y la
+    cantidad de iteraciones realizadas.
+    """
+    next_state_table, reward_table, done_table = _model_tables(env)
+    policy = np.zeros(env.state_space, dtype=int)
+
+    for iteration in range(1, max_iterations + 1):
+        values = policy_evaluation(policy, env, gamma, tol, max_sweeps, in_place)
+        q_table = _q_from_values(values, next_state_table, reward_table, done_table, gamma)
+
+        # Mejora greedy: solo se cambia la acción si mejora estrictamente, para no oscilar entre empates
+        new_policy = q_table.argmax(axis=1)
+        states = np.arange(env.state_space)
+        no_mejora = q_table[states, new_policy] <= q_table[states, policy] + tol
+        new_policy[no_mejora] = policy[no_mejora]
+
+        if np.array_equal(new_policy, policy):
+            break
+        policy = new_policy
+
+    return q_table, iteration
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import numpy as np
+from utilidades.generales import save_atomic
+
+
+def q_table_hash(q_table):
+    """Hash SHA-256 del contenido de la Q-table (identifica de qué tabla sale una política)."""
+    return hashlib.sha256(np.ascontiguousarray(q_table).tobytes()).hexdigest()
+
+
+def _metadata_path(file_path):
+    return os.path.splitext(file_path)[0] + ".json"
+
+
+def _env_metadata(env):
+    """Metadatos que identifican el mapa y la numeración de estados de env."""
+    return {
+        "grid_size": env.grid_size,
+        "pickups": [list(pos) for pos in env.pickups],
+        "dropoffs": [list(pos) for pos in env.dropoffs],
+        "obstacles": [list(pos) for pos in env.city_map.obstacle_positions()],
+        "compact_states": bool(env.state_index.compact),
+        "state_space": int(env.state_space),
+        "action_space": int(env.action_space),
+    }
+
+
+class Policy:
+    """Política greedy precalculada: una acción (int8) por estado.
+
+    Se obtiene una sola vez con argmax sobre la Q-table, así elegir una acción es una
+    lectura del arreglo en lugar de un argmax por paso. Se guarda como un .npy (que se
+    puede abrir con mmap_mode) más un .json con los metadatos del entorno y el hash de
+    la Q-table de origen.
+    """
+
+    def __init__(self, actions, metadata=None):
+        self.actions = actions
+        self.metadata = metadata or {}
+
+    @classmethod
+    def from_q_table(cls, q_table, env=None):
+        """Construye la política greedy de q_table; con env se agregan sus metadatos."""
+        metadata = {"q_table_hash": q_table_hash(q_table)}
+        if env is not None:
+            metadata.update(_env_metadata(env))
+        return cls(np.argmax(q_table, axis=1).astype(np.int8), metadata)
+
+    def save(self, file_path):
+        """Guarda las acciones en file_path (.npy) y los metadatos en el .json del mismo nombre."""
+        save_atomic(file_path, self.actions)
+        with open(_metadata_path(file_path), "w") as file:
+            json.dump(self.metadata, file, indent=2)
+
+    @classmethod
+    def load(cls, file_path, mmap_mode="r"):
+        """Carga una política guardada con save; por defecto las acciones se mapean a memoria."""
+        actions = np.load(file_path, mmap_mode=mmap_mode)
+        metadata = {}
+        if os.path.exists(_metadata_path(file_path)):
+            with open(_metadata_path(file_path)) as file:
+                metadata = json.load(file)
+        return cls(actions, metadata)
+
+    def check_env(self, env):
+        """Lanza ValueError si la política no corresponde al mapa y la numeración de estados de env.
+
+        Se comparan todos los metadatos del entorno guardados (grilla, pickups, dropoffs,
+        obstáculos, estados compactos y tamaños de los espacios).
+        """
+        for key, value in _env_metadata(env).items():
+            if key in self.metadata and self.metadata[key] != value:
+                if key == "obstacles":  # Las listas de obstáculos son largas: solo se informa la diferencia
+                    raise ValueError("La política no corresponde al entorno: los obstáculos son distintos")
+                raise ValueError(
+                    f"La política no corresponde al entorno: {key} es {self.metadata[key]} "
+                    f"y el entorno tiene {value}"
+                )
+        if len(self.actions) != env.state_space:
+            raise ValueError(
+                f"La política tiene {len(self.actions)} estados y el entorno {env.state_space}"
+            )
+
+    def act(self, state):
+        """Acción para un estado."""
+        return int(self.actions[state])
+
+    def act_batch(self, states):
+        """Acciones para un arreglo de estados (por ejemplo, todos los taxis de una flota)."""
+        return self.actions[np.asarray(states)]
@@ -0,0 +1,57 @@
+import numpy as np
+
+
+class StateIndex:
+    """Codifica los estados (fila, columna, pasajero, en taxi) en índices enteros.
+
+    Sin compactar, el índice es el de siempre: (fila * G + columna) * P + pasajero,
+    por 2, más en_taxi. Con compact=True solo se numeran los estados alcanzables (el
+    taxi nunca puede estar sobre un obstáculo), así la Q-table no reserva filas para
+    estados imposibles. to_full y to_compact traducen entre ambas numeraciones.
+    """
+
+    def __init__(self, grid_size, n_pickups, obstacle_grid=None, compact=False):
+        self.grid_size = grid_size
+        self.n_pickups = n_pickups
+        self.full_state_space = grid_size * grid_size * n_pickups * 2
+        self.compact = compact
+
+        if compact:
+            # El índice completo recorre celda, pasajero y en_taxi en ese orden
+            free_cells = ~np.asarray(obstacle_grid, dtype=bool).ravel()
+            self.to_full = np.flatnonzero(np.repeat(free_cells, n_pickups * 2))
+            self.to_compact = np.full(self.full_state_space, -1, dtype=np.int64)
+            self.to_compact[self.to_full] = np.arange(len(self.to_full))
+            self.state_space = len(self.to_full)
+        else:
+            self.to_full = None
+            self.to_compact = None
+            self.state_space = self.full_state_space
+
+    def encode(self, taxi_row, taxi_col, passenger_idx, in_taxi):
+        """Codifica el estado (escalares o arreglos) en su índice.
+
+        En modo compacto lanza ValueError si algún estado tiene el taxi sobre un
+        obstáculo, ya que esos estados no tienen índice.
+        """
+        state = (
+            (taxi_row * self.grid_size + taxi_col) * self.n_pickups + passenger_idx
+        ) * 2 + in_taxi
+        if self.compact:
+            compact_state = self.to_compact[state]
+            if np.any(compact_state < 0):
+                raise ValueError(
+                    "El taxi está sobre un obstáculo: el estado no existe en la numeración compacta"
+                )
+            return compact_state
+        return state
+
+    def decode(self, state):
+        """Decodifica el índice del estado (escalar o arreglo) en sus componentes."""
+        if self.compact:
+            state = self.to_full[state]
+        in_taxi = state % 2
+        state = state // 2
+        passenger_idx = state % self.n_pickups
+        state = state // self.n_pickups
+        return state // self.grid_size, state % self.grid_size, passenger_idx, in_taxi
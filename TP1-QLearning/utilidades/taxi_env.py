@@ -1,23 +1,40 @@
-import random
-import pygame
+import numpy as np
 import os
+from utilidades.city_map import CityMap, STREET_DIRECTION_ACTIONS, city_blocks_grid
+from utilidades.state_index import StateIndex
 
 
 def generate_city_blocks(GRID_SIZE):
-    obstacles = []
-    for row in range(GRID_SIZE):
-        for col in range(GRID_SIZE):
-            if row % 3 == 0 or col % 3 == 0:
-                continue
-            obstacles.append((row, col))
-    return obstacles
+    """Devuelve la lista de posiciones de las manzanas (ver city_blocks_grid para la grilla)."""
+    return [tuple(pos) for pos in np.argwhere(city_blocks_grid(GRID_SIZE)).tolist()]
 
 
 def remove_obstacles(obstacles, to_remove):
     """Elimina de la lista de obstáculos los puntos especificados en to_remove."""
+    to_remove = set(to_remove)
     return [pos for pos in obstacles if pos not in to_remove]
 
 
+def _compile_tables(env):
+    """Tablas (state_space, action_space) de estado siguiente, recompensa y fin de env.
+
+    Evalúa CityMap.transition una sola vez sobre todos los pares (estado, acción); env
+    es un TaxiEnvCustom o un TaxiVecEnv (la misma numeración de estados).
+    """
+    states = np.repeat(np.arange(env.state_space), env.action_space)
+    actions = np.tile(np.arange(env.action_space), env.state_space)
+    taxi_row, taxi_col, passenger_idx, in_taxi = env.decode(states)
+    next_row, next_col, next_in_taxi, rewards, dones = env.city_map.transition(
+        taxi_row, taxi_col, passenger_idx, in_taxi, actions
+    )
+
+    shape = (env.state_space, env.action_space)
+    next_state_table = env.encode(next_row, next_col, passenger_idx, next_in_taxi).reshape(shape)
+    reward_table = rewards.astype(np.int32).reshape(shape)
+    done_table = dones.reshape(shape)
+    return next_state_table, reward_table, done_table
+
+
 class TaxiEnvCustom:
     def __init__(
         self,
@@ -26,226 +43,340 @@ class TaxiEnvCustom:
         DROPOFF_LOCATIONS,
         OBSTACLES,
         img_base_path=None,
+        compiled=False,
+        headless=False,
+        compact_states=False,
+        seed=None,
     ):
         self.img_base_path = img_base_path
+        self.headless = headless
         self.grid_size = GRID_SIZE
         self.pickups = PICKUP_LOCATIONS
         self.dropoffs = DROPOFF_LOCATIONS
         self.obstacles = OBSTACLES
-        self.state_space = GRID_SIZE * GRID_SIZE * len(self.pickups) * 2
         self.action_space = 6
+        # Generador aleatorio propio, para que los episodios sean reproducibles con seed
+        self.rng = np.random.default_rng(seed)
         self.last_action = None  # Inicializar la última acción como None
         self.pickup_colors = None
         self.in_taxi = 0  # 0: no en taxi, 1: en taxi
         self.done = False
-        self.valid_positions = [
-            (r, c)
-            for r in range(self.grid_size)
-            for c in range(self.grid_size)
-            if (r, c) not in self.obstacles
-            and (r, c) not in self.pickups
-            and (r, c) not in self.dropoffs
-        ]
+        self.compiled = False
+        self.next_state_table = None
+        self.reward_table = None
+        self.done_table = None
+        # OBSTACLES puede ser una lista de posiciones o una grilla booleana
+        self.city_map = CityMap(GRID_SIZE, self.pickups, self.dropoffs, OBSTACLES)
+        self.valid_positions = self.city_map.valid_positions()
+        # Con compact_states=True solo se numeran los estados alcanzables (ver StateIndex)
+        self.state_index = StateIndex(
+            GRID_SIZE, len(self.pickups), self.city_map.obstacle_grid, compact_states
+        )
+        self.state_space = self.state_index.state_space
+        if compiled:
+            self.compile()
         self.reset()
 
     def action_space_sample(self):
         """Devuelve una acción aleatoria dentro del espacio de acciones."""
-        return random.randint(0, self.action_space - 1)
+        return int(self.rng.integers(self.action_space))
 
     def encode(self, taxi_row, taxi_col, passenger_idx, in_taxi):
         """Codifica el estado en un número entero único."""
-        return (
-            (taxi_row * self.grid_size + taxi_col) * len(self.pickups) + passenger_idx
-        ) * 2 + in_taxi
+        return self.state_index.encode(taxi_row, taxi_col, passenger_idx, in_taxi)
 
     def decode(self, state):
         """Decodifica el número entero único del estado en sus componentes."""
-        in_taxi = state % 2
-        state //= 2
-        passenger_idx = state % len(self.pickups)
-        state //= len(self.pickups)
-        taxi_col = state % self.grid_size
-        taxi_row = state // self.grid_size
-        return taxi_row, taxi_col, passenger_idx, in_taxi
-
-    def reset(self):
-        self.taxi_row, self.taxi_col = random.choice(self.valid_positions)
-        self.passenger_idx = random.randint(0, len(self.pickups) - 1)
+        return self.state_index.decode(state)
+
+    def reset(self, seed=None):
+        """Reinicia el episodio; con seed se reinicia antes el generador aleatorio del entorno."""
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        # Un único sorteo elige la posición inicial y el pasajero (rng.random es la
+        # llamada escalar más barata del generador)
+        start = int(self.rng.random() * len(self.valid_positions) * len(self.pickups))
+        position, self.passenger_idx = divmod(start, len(self.pickups))
+        self.taxi_row, self.taxi_col = self.valid_positions[position]
         self.in_taxi = 0
-        return self.encode(
+        self.state = self.encode(
             self.taxi_row, self.taxi_col, self.passenger_idx, self.in_taxi
         )
+        return self.state
 
     def step(self, action):
         """Realiza un paso en el entorno según la acción dada."""
+        if self.compiled:
+            # Modo compilado: el paso se reduce a leer las tablas precalculadas
+            next_state = int(self.next_state_table[self.state, action])
+            reward = int(self.reward_table[self.state, action])
+            done = bool(self.done_table[self.state, action])
+            self.taxi_row, self.taxi_col, self.passenger_idx, self.in_taxi = (
+                self.decode(next_state)
+            )
+        else:
+            next_row, next_col, in_taxi, reward, done = self._transition(
+                self.taxi_row, self.taxi_col, self.passenger_idx, self.in_taxi, action
+            )
+            self.taxi_row, self.taxi_col, self.in_taxi = next_row, next_col, in_taxi
+
+            # Obtengo el siguiente estado.
+            next_state = self.encode(
+                self.taxi_row, self.taxi_col, self.passenger_idx, self.in_taxi
+            )
+
+        if done:
+            self.done = done
+        self.last_action = action
+        self.state = next_state
+        return next_state, reward, done, {}
+
+    def _transition(self, taxi_row, taxi_col, passenger_idx, in_taxi, action):
+        """Calcula la dinámica del entorno para un estado y una acción dados.
+
+        Devuelve (fila, columna, in_taxi, recompensa, done) luego de aplicar la acción.
+        """
         reward = -1  # penalización base por movimiento
         done = False
 
-        # Obtener la posición actual del taxi
-        next_row, next_col = self.taxi_row, self.taxi_col
-
         # Obtener la posición luego de realizar la acción
-        if action == 0 and self.taxi_row < self.grid_size - 1:  # mover hacia abajo
+        next_row, next_col = taxi_row, taxi_col
+        if action == 0 and taxi_row < self.grid_size - 1:  # mover hacia abajo
             next_row += 1
-        elif action == 1 and self.taxi_row > 0:  # mover hacia arriba
+        elif action == 1 and taxi_row > 0:  # mover hacia arriba
             next_row -= 1
-        elif action == 2 and self.taxi_col < self.grid_size - 1:  # mover a la derecha
+        elif action == 2 and taxi_col < self.grid_size - 1:  # mover a la derecha
             next_col += 1
-        elif action == 3 and self.taxi_col > 0:  # mover a la izquierda
+        elif action == 3 and taxi_col > 0:  # mover a la izquierda
             next_col -= 1
 
+        city_map = self.city_map
+
         # Verificar si el taxi está actualmente en un pickup o dropoff
-        en_pickup_o_dropoff = (self.taxi_row, self.taxi_col) in self.pickups or (
-            self.taxi_row,
-            self.taxi_col,
-        ) in self.dropoffs
+        en_pickup_o_dropoff = (
+            city_map.pickup_grid[taxi_row, taxi_col]
+            or city_map.dropoff_grid[taxi_row, taxi_col]
+        )
 
         # Penalizar si el movimiento va contra el sentido de la calle, salvo si está en pickup o dropoff
-        street_direction = self.get_street_direction(next_row, next_col)
-        if street_direction and not en_pickup_o_dropoff:
-            if (
-                (action == 0 and street_direction != "down")
-                or (action == 1 and street_direction != "up")
-                or (action == 2 and street_direction != "right")
-                or (action == 3 and street_direction != "left")
-            ):
+        street_direction = city_map.street_grid[next_row, next_col]
+        if street_direction >= 0 and not en_pickup_o_dropoff:
+            if action < 4 and action != street_direction:
                 reward -= 5
 
         # Realizar el movimiento si no hay obstáculos
-        if (next_row, next_col) not in self.obstacles:
-            self.taxi_row, self.taxi_col = next_row, next_col
+        if not city_map.obstacle_grid[next_row, next_col]:
+            taxi_row, taxi_col = next_row, next_col
 
         # Penalizar si el taxi se mueve a una posición dropoff sin pasajero
-        if (self.taxi_row, self.taxi_col) in self.dropoffs and not self.in_taxi:
+        if city_map.dropoff_grid[taxi_row, taxi_col] and not in_taxi:
             reward -= 5
-        
+
         # Levanta al pasajero si está en la posición de recogida, sino penaliza levantar un fantasma...
         # Lo mismo para dejarlo, recompensa si lo deja en la posición de entrega correcta, sino penaliza dejarlo en un lugar incorrecto.
         if action == 4:
-            if (
-                not self.in_taxi
-                and (self.taxi_row, self.taxi_col) == self.pickups[self.passenger_idx]
-            ):
-                self.in_taxi = 1
+            if not in_taxi and (taxi_row, taxi_col) == self.pickups[passenger_idx]:
+                in_taxi = 1
                 reward = 15
             else:
                 reward = -15
         elif action == 5:
-            if self.in_taxi and (self.taxi_row, self.taxi_col) in self.dropoffs:
-                self.in_taxi = 0
+            if in_taxi and city_map.dropoff_grid[taxi_row, taxi_col]:
+                in_taxi = 0
                 reward = 30
                 done = True
-                self.done = done
             else:
                 reward = -15
 
-        self.last_action = action
-
-        # Obtengo el siguiente estado.
-        next_state = self.encode(
-            self.taxi_row, self.taxi_col, self.passenger_idx, self.in_taxi
-        )
-        return next_state, reward, done, {}
+        return taxi_row, taxi_col, in_taxi, reward, done
+
+    def compile(self):
+        """Precalcula las tablas de transición, recompensa y finalización.
+
+        Como el entorno es determinista dado (estado, acción), se evalúa una única vez
+        la dinámica (vectorizada, ver CityMap.transition) sobre todo el espacio de
+        estados y se guarda el resultado en arreglos densos de NumPy de forma
+        (state_space, action_space):
+        - next_state_table: estado siguiente.
+        - reward_table: recompensa obtenida.
+        - done_table: si el episodio termina.
+        """
+        next_state_table, reward_table, done_table = _compile_tables(self)
+        self.next_state_table = next_state_table
+        self.reward_table = reward_table
+        self.done_table = done_table
+        self.compiled = True
+        return next_state_table, reward_table, done_table
 
     def render(self):
+        """Dibuja el estado actual del entorno.
+
+        En modo headless no se abre ninguna ventana y se devuelve el cuadro como un
+        arreglo RGB de forma (alto, ancho, 3).
+        """
+        import pygame  # Solo se importa si se renderiza
+
         # Inicializar pygame si no está inicializado
         if not hasattr(self, "window"):
-            pygame.init()
-            self.cell_size = 50  # Tamaño de cada celda en píxeles
-            self.window_size = (
-                self.grid_size * self.cell_size,
-                self.grid_size * self.cell_size,
+            self._init_render()
+
+        # Copiar la capa estática del mapa (precompuesta una sola vez)
+        self.window.blit(self.static_layer, (0, 0))
+
+        # Dibujar al pasajero si no está en el taxi
+        if not self.in_taxi and not self.done:
+            passenger_row, passenger_col = self.pickups[self.passenger_idx]
+            self.window.blit(
+                self.images["passenger"],
+                (passenger_col * self.cell_size, passenger_row * self.cell_size),
             )
+
+        # Dibujar el taxi
+        if self.last_action == 0:  # Abajo
+            taxi_image = self.taxi_images["down"]
+        elif self.last_action == 1:  # Arriba
+            taxi_image = self.taxi_images["up"]
+        elif self.last_action == 2:  # Derecha
+            taxi_image = self.taxi_images["right"]
+        elif self.last_action == 3:  # Izquierda
+            taxi_image = self.taxi_images["left"]
+        else:  # Acción inicial o desconocida
+            taxi_image = self.taxi_images["down"]
+
+        self.window.blit(
+            taxi_image, (self.taxi_col * self.cell_size, self.taxi_row * self.cell_size)
+        )
+
+        if self.headless:
+            return self.get_frame()
+
+        # Actualizar la pantalla
+        pygame.display.flip()
+
+        # Manejar eventos de pygame para evitar que la ventana se congele
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                exit()
+
+    def _init_render(self):
+        """Inicializa pygame, carga las imágenes y precompone la capa estática del mapa."""
+        import pygame
+
+        if self.headless:
+            # Sin ventana: SDL usa el driver de video "dummy" y se dibuja en memoria
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pygame.init()
+        self.cell_size = 50  # Tamaño de cada celda en píxeles
+        self.window_size = (
+            self.grid_size * self.cell_size,
+            self.grid_size * self.cell_size,
+        )
+        if self.headless:
+            self.window = pygame.Surface(self.window_size)
+        else:
             self.window = pygame.display.set_mode(self.window_size)
-            self.clock = pygame.time.Clock()
+        self.clock = pygame.time.Clock()
 
-            base_path = self.img_base_path
-            img_background = os.path.join(base_path, "taxi_background.png")
-            img_obstacle_horizontal = os.path.join(
-                base_path, "gridworld_median_horiz.png"
-            )
-            img_obstacle_horizontal_last = os.path.join(
-                base_path, "gridworld_median_right.png"
-            )
-            img_obstacle_horizontal_first = os.path.join(
-                base_path, "gridworld_median_left.png"
-            )
-            img_obstacle_vertical = os.path.join(base_path, "gridworld_median_vert.png")
-            img_obstacle_vertical_first = os.path.join(
-                base_path, "gridworld_median_top.png"
-            )
-            img_obstacle_vertical_last = os.path.join(
-                base_path, "gridworld_median_bottom.png"
-            )
-            img_obstacle = os.path.join(base_path, "gridworld_median_horiz.png")
-            img_passenger = os.path.join(base_path, "passenger.png")
-            img_dropoff = os.path.join(base_path, "dropoff.png")
+        base_path = self.img_base_path
+        img_background = os.path.join(base_path, "taxi_background.png")
+        img_obstacle_horizontal = os.path.join(
+            base_path, "gridworld_median_horiz.png"
+        )
+        img_obstacle_horizontal_last = os.path.join(
+            base_path, "gridworld_median_right.png"
+        )
+        img_obstacle_horizontal_first = os.path.join(
+            base_path, "gridworld_median_left.png"
+        )
+        img_obstacle_vertical = os.path.join(base_path, "gridworld_median_vert.png")
+        img_obstacle_vertical_first = os.path.join(
+            base_path, "gridworld_median_top.png"
+        )
+        img_obstacle_vertical_last = os.path.join(
+            base_path, "gridworld_median_bottom.png"
+        )
+        img_obstacle = os.path.join(base_path, "gridworld_median_horiz.png")
+        img_passenger = os.path.join(base_path, "passenger.png")
+        img_dropoff = os.path.join(base_path, "dropoff.png")
 
-            # Cargar la imagen de fondo
-            self.background_image = pygame.transform.scale(
-                pygame.image.load(img_background), self.window_size
-            )
+        # Cargar la imagen de fondo
+        self.background_image = pygame.transform.scale(
+            pygame.image.load(img_background), self.window_size
+        )
 
-            # Cargar otras imágenes si no están cargadas
-            self.images = {
-                "obstacle_horizontal_first": pygame.transform.scale(
-                    pygame.image.load(img_obstacle_horizontal_first),
-                    (self.cell_size, self.cell_size),
-                ),
-                "obstacle_horizontal_last": pygame.transform.scale(
-                    pygame.image.load(img_obstacle_horizontal_last),
-                    (self.cell_size, self.cell_size),
-                ),
-                "obstacle_horizontal": pygame.transform.scale(
-                    pygame.image.load(img_obstacle_horizontal),
-                    (self.cell_size, self.cell_size),
-                ),
-                "obstacle_vertical_first": pygame.transform.scale(
-                    pygame.image.load(img_obstacle_vertical_first),
-                    (self.cell_size, self.cell_size),
-                ),
-                "obstacle_vertical_last": pygame.transform.scale(
-                    pygame.image.load(img_obstacle_vertical_last),
-                    (self.cell_size, self.cell_size),
-                ),
-                "obstacle_vertical": pygame.transform.scale(
-                    pygame.image.load(img_obstacle_vertical),
-                    (self.cell_size, self.cell_size),
-                ),
-                "obstacle": pygame.transform.scale(
-                    pygame.image.load(img_obstacle), (self.cell_size, self.cell_size)
-                ),
-                "passenger": pygame.transform.scale(
-                    pygame.image.load(img_passenger), (self.cell_size, self.cell_size)
-                ),
-                "dropoff": pygame.transform.scale(
-                    pygame.image.load(img_dropoff), (self.cell_size, self.cell_size)
-                ),
-            }
-
-            # Cargar la imagen del taxi
-            img_taxi_up = os.path.join(base_path, "taxi_up.png")
-            img_taxi_down = os.path.join(base_path, "taxi_down.png")
-            img_taxi_left = os.path.join(base_path, "taxi_left.png")
-            img_taxi_right = os.path.join(base_path, "taxi_right.png")
-
-            self.taxi_images = {
-                "up": pygame.transform.scale(
-                    pygame.image.load(img_taxi_up), (self.cell_size, self.cell_size)
-                ),
-                "down": pygame.transform.scale(
-                    pygame.image.load(img_taxi_down), (self.cell_size, self.cell_size)
-                ),
-                "left": pygame.transform.scale(
-                    pygame.image.load(img_taxi_left), (self.cell_size, self.cell_size)
-                ),
-                "right": pygame.transform.scale(
-                    pygame.image.load(img_taxi_right), (self.cell_size, self.cell_size)
-                ),
-            }
+        # Cargar otras imágenes si no están cargadas
+        self.images = {
+            "obstacle_horizontal_first": pygame.transform.scale(
+                pygame.image.load(img_obstacle_horizontal_first),
+                (self.cell_size, self.cell_size),
+            ),
+            "obstacle_horizontal_last": pygame.transform.scale(
+                pygame.image.load(img_obstacle_horizontal_last),
+                (self.cell_size, self.cell_size),
+            ),
+            "obstacle_horizontal": pygame.transform.scale(
+                pygame.image.load(img_obstacle_horizontal),
+                (self.cell_size, self.cell_size),
+            ),
+            "obstacle_vertical_first": pygame.transform.scale(
+                pygame.image.load(img_obstacle_vertical_first),
+                (self.cell_size, self.cell_size),
+            ),
+            "obstacle_vertical_last": pygame.transform.scale(
+                pygame.image.load(img_obstacle_vertical_last),
+                (self.cell_size, self.cell_size),
+            ),
+            "obstacle_vertical": pygame.transform.scale(
+                pygame.image.load(img_obstacle_vertical),
+                (self.cell_size, self.cell_size),
+            ),
+            "obstacle": pygame.transform.scale(
+                pygame.image.load(img_obstacle), (self.cell_size, self.cell_size)
+            ),
+            "passenger": pygame.transform.scale(
+                pygame.image.load(img_passenger), (self.cell_size, self.cell_size)
+            ),
+            "dropoff": pygame.transform.scale(
+                pygame.image.load(img_dropoff), (self.cell_size, self.cell_size)
+            ),
+        }
+
+        # Cargar la imagen del taxi
+        img_taxi_up = os.path.join(base_path, "taxi_up.png")
+        img_taxi_down = os.path.join(base_path, "taxi_down.png")
+        img_taxi_left = os.path.join(base_path, "taxi_left.png")
+        img_taxi_right = os.path.join(base_path, "taxi_right.png")
+
+        self.taxi_images = {
+            "up": pygame.transform.scale(
+                pygame.image.load(img_taxi_up), (self.cell_size, self.cell_size)
+            ),
+            "down": pygame.transform.scale(
+                pygame.image.load(img_taxi_down), (self.cell_size, self.cell_size)
+            ),
+            "left": pygame.transform.scale(
+                pygame.image.load(img_taxi_left), (self.cell_size, self.cell_size)
+            ),
+            "right": pygame.transform.scale(
+                pygame.image.load(img_taxi_right), (self.cell_size, self.cell_size)
+            ),
+        }
+
+        self.static_layer = self._draw_static_layer()
+
+    def _draw_static_layer(self):
+        """Dibuja una única vez todo lo que no cambia entre cuadros.
+
+        Fondo, cuadrícula, obstáculos, flechas de las calles, puntos de recogida y
+        puntos de entrega quedan en una superficie que render copia en cada cuadro.
+        """
+        import pygame
+
+        surface = pygame.Surface(self.window_size)
 
         # Dibujar la imagen de fondo
-        self.window.blit(self.background_image, (0, 0))
+        surface.blit(self.background_image, (0, 0))
 
         # Dibujar la cuadrícula (opcional, si quieres mantener las líneas de la cuadrícula)
         for row in range(self.grid_size):
@@ -257,11 +388,12 @@ class TaxiEnvCustom:
                     self.cell_size,
                 )
                 pygame.draw.rect(
-                    self.window, (200, 200, 200), rect, 1
+                    surface, (200, 200, 200), rect, 1
                 )  # Bordes de la celda
 
-        # Dibujar los obstáculos
-        for i, (r, c) in enumerate(self.obstacles):
+        # Dibujar los obstáculos (en orden por filas, a partir de la grilla del mapa)
+        obstacles = self.city_map.obstacle_positions()
+        for i, (r, c) in enumerate(obstacles):
             # Determinar si el obstáculo es parte de un grupo horizontal o vertical
             is_horizontal = False
             is_vertical = False
@@ -269,28 +401,28 @@ class TaxiEnvCustom:
             # Verificar si el obstáculo es parte de un grupo horizontal
             if (
                 i > 0
-                and self.obstacles[i - 1][0] == r
-                and self.obstacles[i - 1][1] == c - 1
+                and obstacles[i - 1][0] == r
+                and obstacles[i - 1][1] == c - 1
             ):
                 is_horizontal = True
             if (
-                i < len(self.obstacles) - 1
-                and self.obstacles[i + 1][0] == r
-                and self.obstacles[i + 1][1] == c + 1
+                i < len(obstacles) - 1
+                and obstacles[i + 1][0] == r
+                and obstacles[i + 1][1] == c + 1
             ):
                 is_horizontal = True
 
             # Verificar si el obstáculo es parte de un grupo vertical
             if (
                 i > 0
-                and self.obstacles[i - 1][1] == c
-                and self.obstacles[i - 1][0] == r - 1
+                and obstacles[i - 1][1] == c
+                and obstacles[i - 1][0] == r - 1
             ):
                 is_vertical = True
             if (
-                i < len(self.obstacles) - 1
-                and self.obstacles[i + 1][1] == c
-                and self.obstacles[i + 1][0] == r + 1
+                i < len(obstacles) - 1
+                and obstacles[i + 1][1] == c
+                and obstacles[i + 1][0] == r + 1
             ):
                 is_vertical = True
 
@@ -299,37 +431,37 @@ class TaxiEnvCustom:
                 # Es parte de un grupo horizontal
                 if (
                     i > 0
-                    and self.obstacles[i - 1][0] == r
-                    and self.obstacles[i - 1][1] == c - 1
+                    and obstacles[i - 1][0] == r
+                    and obstacles[i - 1][1] == c - 1
                     and (
-                        i == len(self.obstacles) - 1
-                        or self.obstacles[i + 1][0] != r
-                        or self.obstacles[i + 1][1] != c + 1
+                        i == len(obstacles) - 1
+                        or obstacles[i + 1][0] != r
+                        or obstacles[i + 1][1] != c + 1
                     )
                 ):
                     # Último en el grupo horizontal
-                    self.window.blit(
+                    surface.blit(
                         self.images["obstacle_horizontal_last"],
                         (c * self.cell_size, r * self.cell_size),
                     )
                 elif (
-                    i < len(self.obstacles) - 1
-                    and self.obstacles[i + 1][0] == r
-                    and self.obstacles[i + 1][1] == c + 1
+                    i < len(obstacles) - 1
+                    and obstacles[i + 1][0] == r
+                    and obstacles[i + 1][1] == c + 1
                     and (
                         i == 0
-                        or self.obstacles[i - 1][0] != r
-                        or self.obstacles[i - 1][1] != c - 1
+                        or obstacles[i - 1][0] != r
+                        or obstacles[i - 1][1] != c - 1
                     )
                 ):
                     # Primero en el grupo horizontal
-                    self.window.blit(
+                    surface.blit(
                         self.images["obstacle_horizontal_first"],
                         (c * self.cell_size, r * self.cell_size),
                     )
                 else:
                     # Intermedio en el grupo horizontal
-                    self.window.blit(
+                    surface.blit(
                         self.images["obstacle_horizontal"],
                         (c * self.cell_size, r * self.cell_size),
                     )
@@ -337,50 +469,54 @@ class TaxiEnvCustom:
                 # Es parte de un grupo vertical
                 if (
                     i > 0
-                    and self.obstacles[i - 1][1] == c
-                    and self.obstacles[i - 1][0] == r - 1
+                    and obstacles[i - 1][1] == c
+                    and obstacles[i - 1][0] == r - 1
                     and (
-                        i == len(self.obstacles) - 1
-                        or self.obstacles[i + 1][1] != c
-                        or self.obstacles[i + 1][0] != r + 1
+                        i == len(obstacles) - 1
+                        or obstacles[i + 1][1] != c
+                        or obstacles[i + 1][0] != r + 1
                     )
                 ):
                     # Último en el grupo vertical
-                    self.window.blit(
+                    surface.blit(
                         self.images["obstacle_vertical_last"],
                         (c * self.cell_size, r * self.cell_size),
                     )
                 elif (
-                    i < len(self.obstacles) - 1
-                    and self.obstacles[i + 1][1] == c
-                    and self.obstacles[i + 1][0] == r + 1
+                    i < len(obstacles) - 1
+                    and obstacles[i + 1][1] == c
+                    and obstacles[i + 1][0] == r + 1
                     and (
                         i == 0
-                        or self.obstacles[i - 1][1] != c
-                        or self.obstacles[i - 1][0] != r - 1
+                        or obstacles[i - 1][1] != c
+                        or obstacles[i - 1][0] != r - 1
                     )
                 ):
                     # Primero en el grupo vertical
-                    self.window.blit(
+                    surface.blit(
                         self.images["obstacle_vertical_first"],
                         (c * self.cell_size, r * self.cell_size),
                     )
                 else:
                     # Intermedio en el grupo vertical
-                    self.window.blit(
+                    surface.blit(
                         self.images["obstacle_vertical"],
                         (c * self.cell_size, r * self.cell_size),
                     )
             else:
                 # Obstáculo aislado
-                self.window.blit(
+                surface.blit(
                     self.images["obstacle"], (c * self.cell_size, r * self.cell_size)
                 )
 
         # Dibujar las flechas de orientación de calles
+        street_directions = {
+            action: direction for direction, action in STREET_DIRECTION_ACTIONS.items()
+        }
+        street_directions[-1] = None
         for row in range(self.grid_size):
             for col in range(self.grid_size):
-                direction = self.get_street_direction(row, col)
+                direction = street_directions[self.city_map.street_grid[row, col]]
                 if direction:
                     center_x = col * self.cell_size + self.cell_size // 2
                     center_y = row * self.cell_size + self.cell_size // 2
@@ -411,7 +547,7 @@ class TaxiEnvCustom:
                             (center_x - size, center_y + size),
                         ]
 
-                    pygame.draw.polygon(self.window, (255, 0, 0), points)
+                    pygame.draw.polygon(surface, (255, 0, 0), points)
 
         # Dibujar los puntos de recogida con fondo de color distinto
         for r, c in self.pickups:
@@ -419,53 +555,30 @@ class TaxiEnvCustom:
                 c * self.cell_size, r * self.cell_size, self.cell_size, self.cell_size
             )
             pygame.draw.rect(
-                self.window, (173, 216, 230), rect
+                surface, (173, 216, 230), rect
             )  # Fondo azul claro para puntos de recogida
-
-        # Dibujar al pasajero si no está en el taxi
-        if not self.in_taxi and not self.done:
-            passenger_row, passenger_col = self.pickups[self.passenger_idx]
-            self.window.blit(
-                self.images["passenger"],
-                (passenger_col * self.cell_size, passenger_row * self.cell_size),
-            )
-
         # Dibujar los puntos de entrega
         for r, c in self.dropoffs:
-            self.window.blit(
+            surface.blit(
                 self.images["dropoff"], (c * self.cell_size, r * self.cell_size)
             )
 
-        # Dibujar el taxi
-        if self.last_action == 0:  # Abajo
-            taxi_image = self.taxi_images["down"]
-        elif self.last_action == 1:  # Arriba
-            taxi_image = self.taxi_images["up"]
-        elif self.last_action == 2:  # Derecha
-            taxi_image = self.taxi_images["right"]
-        elif self.last_action == 3:  # Izquierda
-            taxi_image = self.taxi_images["left"]
-        else:  # Acción inicial o desconocida
-            taxi_image = self.taxi_images["down"]
-
-        self.window.blit(
-            taxi_image, (self.taxi_col * self.cell_size, self.taxi_row * self.cell_size)
-        )
-
-        # Actualizar la pantalla
-        pygame.display.flip()
-
-        # Manejar eventos de pygame para evitar que la ventana se congele
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                exit()
+        return surface
 
     def save_render(self, img_path):
         """Guarda la imagen renderizada actual en el archivo especificado."""
+        import pygame
+
         pygame.image.save(self.window, img_path)
 
-    def get_street_direction(self, row, col):
+    def get_frame(self):
+        """Devuelve la imagen renderizada actual como un arreglo RGB de forma (alto, ancho, 3)."""
+        import pygame
+
+        return pygame.surfarray.array3d(self.window).swapaxes(0, 1)
+
+    @staticmethod
+    def get_street_direction(row, col):
         # Si estamos sobre una calle horizontal (fila múltiplo de 3)
         if row % 3 == 0 and col % 3 != 0:
             if (row // 3) % 2 == 0:
@@ -481,3 +594,99 @@ class TaxiEnvCustom:
                 return "down"  # circulación ↑ arriba
 
         return None  # dentro de manzana o intersección
+
+
+class TaxiVecEnv:
+    """Versión vectorizada de TaxiEnvCustom que avanza N taxis independientes a la vez.
+
+    El estado de cada taxi se guarda como su número de estado en un arreglo de NumPy
+    y la dinámica es la misma que la de TaxiEnvCustom.step: al crearlo se compilan las
+    tablas de estado siguiente, recompensa y fin (como en TaxiEnvCustom.compile) y cada
+    paso las indexa con (estados, acciones). Los episodios que terminan (o que
+    alcanzan max_steps) se reinician automáticamente.
+    """
+
+    def __init__(
+        self,
+        GRID_SIZE,
+        PICKUP_LOCATIONS,
+        DROPOFF_LOCATIONS,
+        OBSTACLES,
+        max_steps=200,
+        seed=None,
+        compact_states=False,
+    ):
+        self.grid_size = GRID_SIZE
+        self.pickups = PICKUP_LOCATIONS
+        self.dropoffs = DROPOFF_LOCATIONS
+        self.obstacles = OBSTACLES
+        self.action_space = 6
+        self.max_steps = max_steps
+        self.rng = np.random.default_rng(seed)
+
+        # Mapa de la ciudad como grillas de NumPy para poder indexarlo en lote
+        self.city_map = CityMap(GRID_SIZE, self.pickups, self.dropoffs, OBSTACLES)
+        self.valid_rows = self.city_map.valid_rows
+        self.valid_cols = self.city_map.valid_cols
+        self.state_index = StateIndex(
+            GRID_SIZE, len(self.pickups), self.city_map.obstacle_grid, compact_states
+        )
+        self.state_space = self.state_index.state_space
+        self.next_state_table, self.reward_table, self.done_table = _compile_tables(self)
+
+        self.num_envs = 0
+
+    def encode(self, taxi_row, taxi_col, passenger_idx, in_taxi):
+        """Codifica los estados (arreglos) en números enteros únicos."""
+        return self.state_index.encode(taxi_row, taxi_col, passenger_idx, in_taxi)
+
+    def decode(self, state):
+        """Decodifica los números enteros de los estados en sus componentes."""
+        return self.state_index.decode(state)
+
+    def reset(self, n=None, seed=None):
+        """Reinicia n episodios independientes y devuelve sus estados iniciales."""
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        if n is not None:
+            self.num_envs = n
+        self.states = np.zeros(self.num_envs, dtype=np.int64)
+        self.steps = np.zeros(self.num_envs, dtype=np.int64)
+        self._reset_indices(np.arange(self.num_envs))
+        return self.states.copy()
+
+    def _reset_indices(self, idx):
+        """Sortea una nueva posición y pasajero para los episodios indicados."""
+        positions = self.rng.integers(0, len(self.valid_rows), size=len(idx))
+        passenger_idx = self.rng.integers(0, len(self.pickups), size=len(idx))
+        self.states[idx] = self.encode(
+            self.valid_rows[positions], self.valid_cols[positions], passenger_idx, 0
+        )
+        self.steps[idx] = 0
+
+    def step(self, actions):
+        """Avanza todos los episodios con las acciones dadas (una por taxi).
+
+        Devuelve (next_states, rewards, dones, info). Para los episodios que terminan
+        o se truncan, next_states ya contiene el estado reiniciado; el estado final
+        real queda en info["final_state"].
+        """
+        actions = np.asarray(actions)
+        next_states = self.next_state_table[self.states, actions]
+        rewards = self.reward_table[self.states, actions]
+        dones = self.done_table[self.states, actions]
+        self.steps += 1
+
+        if self.max_steps:
+            truncated = ~dones & (self.steps >= self.max_steps)
+        else:
+            truncated = np.zeros_like(dones)
+        info = {"final_state": next_states, "truncated": truncated}
+
+        # Reiniciar automáticamente los episodios terminados
+        self.states = next_states.copy()
+        finished = np.flatnonzero(dones | truncated)
+        if len(finished):
+            self._reset_indices(finished)
+
+        return self.states.copy(), rewards, dones, info
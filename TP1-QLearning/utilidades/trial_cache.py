@@ -0,0 +1,73 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import numpy as np
+from utilidades.generales import save_atomic
+
+
+def env_config(env):
+    """Configuración del mapa de un entorno, para incluirla en la clave de un trial."""
+    return {
+        "grid_size": env.grid_size,
+        "pickups": [list(pos) for pos in env.pickups],
+        "dropoffs": [list(pos) for pos in env.dropoffs],
+        "obstacles": [list(pos) for pos in env.city_map.obstacle_positions()],
+        "compact_states": bool(env.state_index.compact),
+    }
+
+
+def config_key(config):
+    """Hash SHA-256 de una configuración (diccionario serializable a JSON)."""
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+class TrialCache:
+    """Resultados de trials ya evaluados, guardados en SQLite y indexados por config_key.
+
+    Cada fila guarda la configuración completa (hiperparámetros, episodios, semilla,
+    algoritmo y mapa), el valor obtenido y la ruta de su Q-table, que se guarda aparte
+    en la carpeta <db>_q_tables. Las filas se escriben (commit) apenas termina cada
+    trial, así un estudio interrumpido no pierde lo ya calculado y varios procesos
+    pueden compartir el mismo archivo.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.q_table_dir = os.path.splitext(db_path)[0] + "_q_tables"
+        os.makedirs(self.q_table_dir, exist_ok=True)
+        self.connection = sqlite3.connect(db_path, timeout=60)
+        # WAL permite leer mientras otro proceso escribe
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS trials ("
+            "key TEXT PRIMARY KEY, config TEXT, value REAL, q_table_path TEXT, created REAL)"
+        )
+        self.connection.commit()
+
+    def get(self, key):
+        """Devuelve (valor, ruta de la Q-table) de la configuración, o None si no está."""
+        row = self.connection.execute(
+            "SELECT value, q_table_path FROM trials WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or not os.path.exists(row[1]):
+            return None
+        return row
+
+    def put(self, key, config, value, q_table):
+        """Guarda el resultado de una configuración y devuelve la ruta de su Q-table."""
+        q_table_path = os.path.join(self.q_table_dir, f"{key}.npy")
+        save_atomic(q_table_path, np.asarray(q_table))
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO trials VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(config, sort_keys=True), float(value), q_table_path, time.time()),
+            )
+        return q_table_path
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM trials").fetchone()[0]
+
+    def close(self):
+        self.connection.close()